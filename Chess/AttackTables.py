@@ -0,0 +1,137 @@
+"""
+Attack tables precomputed once at import.
+Knight, king and pawn attacks only depend on the square, so they are plain lists indexed by square.
+Rook and bishop attacks also depend on the pieces standing in the way. For every square only the
+relevant occupancy (the squares on its rays, without the board edge) can change the attacks, so
+each square has a table from every subset of its relevant occupancy to the attacked squares.
+This is the PEXT idea of indexing by the masked occupancy; a dict keyed by the masked occupancy
+does the indexing here, since Python integers make magic multiplication slower than hashing.
+"""
+
+from Bitboard import SQUARE_BITS, iterateSquares
+
+ROOK_DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1))  # up, left, down, right
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, 1), (1, -1))  # diagonals: up/left up/right down/right down/left
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def _onBoard(row, col):
+    return 0 <= row <= 7 and 0 <= col <= 7
+
+
+def _leaperAttacks(offsets):
+    table = []
+    for square in range(64):
+        row, col = square >> 3, square & 7
+        attacks = 0
+        for d_row, d_col in offsets:
+            if _onBoard(row + d_row, col + d_col):
+                attacks |= SQUARE_BITS[(row + d_row) * 8 + col + d_col]
+        table.append(attacks)
+    return table
+
+
+def _slidingAttacks(square, occupied, directions):
+    """
+    Walk every ray from the square until the edge of the board or the first occupied square (included).
+    """
+    row, col = square >> 3, square & 7
+    attacks = 0
+    for d_row, d_col in directions:
+        end_row, end_col = row + d_row, col + d_col
+        while _onBoard(end_row, end_col):
+            bit = SQUARE_BITS[end_row * 8 + end_col]
+            attacks |= bit
+            if occupied & bit:
+                break
+            end_row += d_row
+            end_col += d_col
+    return attacks
+
+
+def _relevantMask(square, directions):
+    """
+    Squares whose occupancy can stop a ray from the square, the last square of every ray is left out
+    because a piece there does not hide anything.
+    """
+    row, col = square >> 3, square & 7
+    mask = 0
+    for d_row, d_col in directions:
+        end_row, end_col = row + d_row, col + d_col
+        while _onBoard(end_row + d_row, end_col + d_col):
+            mask |= SQUARE_BITS[end_row * 8 + end_col]
+            end_row += d_row
+            end_col += d_col
+    return mask
+
+
+def _slidingTables(directions):
+    masks = []
+    tables = []
+    for square in range(64):
+        mask = _relevantMask(square, directions)
+        table = {}
+        subset = 0
+        while True:  # enumerate every subset of the mask (Carry-Rippler trick)
+            table[subset] = _slidingAttacks(square, subset, directions)
+            subset = (subset - mask) & mask
+            if subset == 0:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+def _betweenTable():
+    """
+    between[a][b] has the squares strictly between a and b if they share a rank, file or diagonal, else 0.
+    """
+    between = [[0] * 64 for _ in range(64)]
+    for square in range(64):
+        row, col = square >> 3, square & 7
+        for d_row, d_col in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            squares_between = 0
+            end_row, end_col = row + d_row, col + d_col
+            while _onBoard(end_row, end_col):
+                between[square][end_row * 8 + end_col] = squares_between
+                squares_between |= SQUARE_BITS[end_row * 8 + end_col]
+                end_row += d_row
+                end_col += d_col
+    return between
+
+
+def _lineTable():
+    """
+    line[a][b] has the whole rank, file or diagonal through a and b (edge to edge) if they share one, else 0.
+    """
+    line = [[0] * 64 for _ in range(64)]
+    for square in range(64):
+        for direction in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            opposite = (-direction[0], -direction[1])
+            full_line = SQUARE_BITS[square] | _slidingAttacks(square, 0, (direction, opposite))
+            for end_square in iterateSquares(_slidingAttacks(square, 0, (direction,))):
+                line[square][end_square] = full_line
+    return line
+
+
+KNIGHT_ATTACKS = _leaperAttacks(KNIGHT_OFFSETS)
+KING_ATTACKS = _leaperAttacks(KING_OFFSETS)
+# squares attacked by a pawn of the given color standing on the square
+PAWN_ATTACKS = [_leaperAttacks(((-1, -1), (-1, 1))), _leaperAttacks(((1, -1), (1, 1)))]
+ROOK_MASKS, ROOK_TABLES = _slidingTables(ROOK_DIRECTIONS)
+BISHOP_MASKS, BISHOP_TABLES = _slidingTables(BISHOP_DIRECTIONS)
+BETWEEN = _betweenTable()
+LINE = _lineTable()
+
+
+def rookAttacks(square, occupied):
+    return ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+
+
+def bishopAttacks(square, occupied):
+    return BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
+
+
+def queenAttacks(square, occupied):
+    return ROOK_TABLES[square][occupied & ROOK_MASKS[square]] | BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
@@ -0,0 +1,153 @@
+"""
+Analysing a file of positions without the GUI, on several processes.
+Every line is a FEN or an EPD record, EPD best move operations (bm) are checked against the move found, so
+test suites can be scored. A JSON object per position is written to the output as soon as it is done, in the
+order of the input. Run from the Chess directory:
+    python BatchAnalysis.py positions.epd --depth 6
+    python BatchAnalysis.py positions.fen --time 2 --processes 4 --output results.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+
+import ChessEngine
+import Tablebase
+from ChessAI import Search, SearchLimits
+from TranspositionTable import TranspositionTable
+
+DEFAULT_HASH_MB = 16
+
+_transposition_table = None  # one per worker process, cleared before every position
+
+
+def parseEPD(line):
+    """
+    (FEN, operations) of a FEN or EPD line, operations maps the EPD opcodes to their operands as lists of strings.
+    EPD has only the first four FEN fields, the move counters come from its hmvc and fmvn operations if given.
+    """
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError("a position needs at least four fields: " + line)
+    rest = fields[4] if len(fields) > 4 else ""
+    clocks = rest.split()
+    if len(clocks) == 2 and clocks[0].isdigit() and clocks[1].isdigit():  # a complete FEN
+        return line, {}
+    operations = {}
+    for operation in rest.split(";"):
+        words = operation.split(None, 1)
+        if words:
+            operands = words[1].split() if len(words) > 1 else []
+            operations[words[0]] = [operand.strip('"') for operand in operands]
+    halfmove_clock = operations.get("hmvc", ["0"])[0]
+    fullmove_number = operations.get("fmvn", ["1"])[0]
+    return " ".join(fields[:4] + [halfmove_clock, fullmove_number]), operations
+
+
+def initWorker(hash_mb, syzygy_path):
+    """
+    Set up a worker process. syzygy_path must be a directory main already opened, a pool whose workers fail here
+    starts new ones forever.
+    """
+    global _transposition_table
+    _transposition_table = TranspositionTable(hash_mb)
+    Tablebase.loadKPK()
+    if syzygy_path is not None:
+        Tablebase.openSyzygy(syzygy_path)
+
+
+def analysePosition(task):
+    """
+    Worker: search one position, task is (line number, line, SearchLimits). Returns the result as a dictionary,
+    with an error instead of the search results if the line isn't a valid position or anything fails for it.
+    """
+    line_number, line, limits = task
+    result = {"line": line_number}
+    try:
+        FEN, operations = parseEPD(line)
+        game_state = ChessEngine.GameState()
+        game_state.FEN_to_board(FEN)
+    except ValueError as error:
+        result["error"] = str(error)
+        return result
+    result["fen"] = game_state.board_to_FEN()
+    if "id" in operations:
+        result["id"] = " ".join(operations["id"])
+    try:
+        _transposition_table.clear()
+        search = Search(game_state, _transposition_table).iterativeDeepening(limits)
+        analysis = {"best_move": None, "san": None}
+        if search.best_move is not None:
+            analysis["best_move"] = game_state.moveToUCI(search.best_move)
+            analysis["san"] = game_state.moveToSAN(search.best_move)
+        analysis.update(score=search.score, depth=search.depth, nodes=search.nodes, nps=search.nodes_per_second,
+                        time=round(search.elapsed, 3))
+        if "bm" in operations:
+            best_moves = [game_state.parseMove(move) for move in operations["bm"]]
+            analysis["bm"] = operations["bm"]
+            analysis["solved"] = search.best_move in best_moves
+    except Exception as error:  # one position that breaks the engine mustn't end the run of the others
+        result["error"] = "{}: {}".format(type(error).__name__, error)
+    else:
+        result.update(analysis)
+    return result
+
+
+def readTasks(lines, limits):
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line_number, line, limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse the positions of a FEN or EPD file, one JSON line each.")
+    parser.add_argument("input", help="file with a FEN or EPD position per line, - for standard input")
+    parser.add_argument("--depth", type=int, help="search every position to this depth")
+    parser.add_argument("--time", type=float, help="seconds to search every position")
+    parser.add_argument("--nodes", type=int, help="nodes to search every position")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(),
+                        help="positions searched at the same time, the number of CPU cores by default")
+    parser.add_argument("--hash", type=int, default=DEFAULT_HASH_MB, help="transposition table MB per process")
+    parser.add_argument("--syzygy", help="directory of Syzygy tablebase files, needs python-chess")
+    parser.add_argument("--output", help="file for the results, standard output by default")
+    args = parser.parse_args()
+    limits = SearchLimits(depth=args.depth, nodes=args.nodes, move_time=args.time)
+    if not limits.isBounded():
+        parser.error("give a --depth, --time or --nodes limit")
+    if args.syzygy is not None:
+        try:
+            Tablebase.openSyzygy(args.syzygy)
+        except (ImportError, OSError) as error:
+            parser.error("can't open the Syzygy tablebases: {}".format(error))
+
+    lines = sys.stdin if args.input == "-" else open(args.input)
+    output = open(args.output, "w") if args.output else sys.stdout
+    tasks = readTasks(lines, limits)
+    if args.processes > 1:
+        pool = multiprocessing.Pool(args.processes, initWorker, (args.hash, args.syzygy))
+        results = pool.imap(analysePosition, tasks)
+    else:
+        pool = None
+        initWorker(args.hash, args.syzygy)
+        results = map(analysePosition, tasks)
+    positions = solved = tested = 0
+    for result in results:
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        positions += 1
+        if "solved" in result:
+            tested += 1
+            solved += result["solved"]
+    if pool is not None:
+        pool.close()
+        pool.join()
+    summary = "{} positions analysed".format(positions)
+    if tested:
+        summary += ", {} of {} best moves found".format(solved, tested)
+    print(summary, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Bitboard representation of a chess position.
+Every piece type of every color is stored as a 64-bit integer where bit i is set
+if such a piece stands on square i. Squares are numbered the same way the 8x8 board
+is indexed: square = row * 8 + col, so a8 is 0 and h1 is 63.
+"""
+
+# piece codes, also used as indexes into the list of piece bitboards
+WHITE_PAWN, WHITE_KNIGHT, WHITE_BISHOP, WHITE_ROOK, WHITE_QUEEN, WHITE_KING = range(6)
+BLACK_PAWN, BLACK_KNIGHT, BLACK_BISHOP, BLACK_ROOK, BLACK_QUEEN, BLACK_KING = range(6, 12)
+EMPTY = 12
+
+# piece types, piece code = color * 6 + piece type
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+WHITE, BLACK = 0, 1
+
+PIECE_NAMES = ["wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK", "--"]
+PIECE_CODES = {name: code for code, name in enumerate(PIECE_NAMES)}
+
+FULL_BOARD = 0xFFFFFFFFFFFFFFFF
+SQUARE_BITS = [1 << square for square in range(64)]
+
+
+def squareIndex(row, col):
+    return row * 8 + col
+
+
+def squareRowCol(square):
+    return square >> 3, square & 7
+
+
+def popCount(bitboard):
+    return bin(bitboard).count("1")
+
+
+def lowestSquare(bitboard):
+    """
+    Index of the least significant set bit. The bitboard must not be empty.
+    """
+    return (bitboard & -bitboard).bit_length() - 1
+
+
+def iterateSquares(bitboard):
+    """
+    Yield the index of every set bit, from the lowest to the highest.
+    """
+    while bitboard:
+        lowest_bit = bitboard & -bitboard
+        yield lowest_bit.bit_length() - 1
+        bitboard ^= lowest_bit
+
+
+class Bitboards:
+    def __init__(self):
+        """
+        pieces holds one bitboard for every piece code.
+        colors holds the occupancy of white and black pieces, occupied the occupancy of both.
+        squares is the piece code standing on every square (EMPTY if there is no piece),
+        so that the piece on a given square can be found without testing twelve bitboards.
+        """
+        self.pieces = [0] * 12
+        self.colors = [0, 0]
+        self.occupied = 0
+        self.squares = [EMPTY] * 64
+
+    @classmethod
+    def fromBoard(cls, board):
+        """
+        Build the bitboards from an 8x8 board of two character piece names.
+        """
+        bitboards = cls()
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece != "--":
+                    bitboards.putPiece(PIECE_CODES[piece], squareIndex(row, col))
+        return bitboards
+
+    def toBoard(self):
+        """
+        8x8 board of two character piece names, the representation used by the UI.
+        """
+        return [[PIECE_NAMES[self.squares[row * 8 + col]] for col in range(8)] for row in range(8)]
+
+    def putPiece(self, piece, square):
+        bit = SQUARE_BITS[square]
+        self.pieces[piece] |= bit
+        self.colors[piece >= 6] |= bit
+        self.occupied |= bit
+        self.squares[square] = piece
+
+    def removePiece(self, square):
+        """
+        Remove the piece standing on the square and return its code.
+        """
+        piece = self.squares[square]
+        bit = SQUARE_BITS[square]
+        self.pieces[piece] ^= bit
+        self.colors[piece >= 6] ^= bit
+        self.occupied ^= bit
+        self.squares[square] = EMPTY
+        return piece
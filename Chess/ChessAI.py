@@ -0,0 +1,465 @@
+"""
+Finding the best move for the side to move.
+Negamax search with alpha-beta pruning, run with iterative deepening so that a move from the last
+completed depth is always ready when the time runs out.
+"""
+
+import time
+
+import Tablebase
+from Bitboard import KNIGHT, BISHOP, ROOK, QUEEN, WHITE_KING, BLACK_KING, popCount, squareIndex
+from Evaluation import PIECE_SQUARE_VALUES, evaluate, evaluateMoves, mopUpScore
+from MoveEncoding import CAPTURE_BIT, PROMOTION_BIT
+from MoveOrdering import MoveOrdering, MAX_PLY
+from TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+CHECKMATE = 100000
+STALEMATE = 0
+DRAW = 0  # repetitions and the fifty-move rule
+MAX_DEPTH = 64
+INFINITY = CHECKMATE + 1
+MATE_THRESHOLD = CHECKMATE - MAX_DEPTH  # scores beyond this are mates found at some ply
+KNOWN_WIN = 10000  # tablebase wins score this plus progress, more than any evaluation and less than a mate
+DELTA_MARGIN = 200  # a capture is skipped in quiescence search if even winning this much more can't reach alpha
+ASPIRATION_DEPTH = 4  # iterations from this depth on start with a window around the last score
+ASPIRATION_WINDOW = 50
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_REDUCTION = 2  # the null move is searched this much less deep, one more at depth 7 and beyond
+LMR_MIN_DEPTH = 3
+LMR_MOVE_COUNT = 3  # quiet moves after this many are searched one less deep, after twice as many two less
+POLL_INTERVAL = 256  # the clock, the node cap and the stop_event are checked every this many nodes, a power of 2
+MOVE_OVERHEAD = 0.05  # seconds kept back from the clock for passing the move on
+DEFAULT_MOVES_TO_GO = 30  # moves the remaining time is shared among when the time control doesn't tell
+HARD_LIMIT_FACTOR = 4  # an unfinished iteration may go on until this many times the share of the move
+
+
+def hasPieces(game_state):
+    """
+    Determine if the side to move has a piece other than pawns and the king.
+    """
+    pieces = game_state.bitboards.pieces
+    first_piece = 0 if game_state.white_to_move else 6
+    return (pieces[first_piece + KNIGHT] | pieces[first_piece + BISHOP] | pieces[first_piece + ROOK]
+            | pieces[first_piece + QUEEN]) != 0
+
+
+def tablebaseScore(game_state, result):
+    """
+    Score for the side to move of a position the tablebase has a result for. A win is worth KNOWN_WIN plus the
+    evaluation and the mop-up bonus of the winning side, so that the search still makes progress towards the mate.
+    """
+    if result == Tablebase.DRAW:
+        return DRAW
+    white_king = squareIndex(*game_state.white_king_location)
+    black_king = squareIndex(*game_state.black_king_location)
+    # the king tables are for the middlegame, here the kings should go where mopUpScore wants them
+    score = game_state.piece_square_score - PIECE_SQUARE_VALUES[WHITE_KING][white_king] \
+        - PIECE_SQUARE_VALUES[BLACK_KING][black_king]
+    if game_state.white_to_move == (result == Tablebase.WIN):  # white wins
+        score = KNOWN_WIN + score + mopUpScore(white_king, black_king)
+    else:
+        score = KNOWN_WIN - score + mopUpScore(black_king, white_king)
+    return score if result == Tablebase.WIN else -score
+
+
+def scoreToTable(score, ply):
+    """
+    Mate scores count plies from the root, the table stores them counted from the position itself.
+    """
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def scoreFromTable(score, ply):
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+class SearchResult:
+    def __init__(self, best_move, score, depth, nodes, elapsed):
+        """
+        best_move is the 16-bit move (see MoveEncoding), None only if there are no valid moves.
+        score is in centipawns from the point of view of the side to move, depth is the last completed depth.
+        """
+        self.best_move = best_move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.nodes_per_second = int(nodes / elapsed) if elapsed > 0 else 0
+
+
+class SearchLimits:
+    def __init__(self, depth=None, nodes=None, move_time=None, white_time=None, black_time=None,
+                 white_increment=0, black_increment=0, moves_to_go=None):
+        """
+        Budget of a search, None means no limit. Times are in seconds: move_time is a fixed time for the move,
+        white_time and black_time are the clocks with their increments per move, moves_to_go the moves left until
+        the next time control (sudden death if None). The search stops at whichever limit comes first.
+        """
+        self.depth = depth
+        self.nodes = nodes
+        self.move_time = move_time
+        self.white_time = white_time
+        self.black_time = black_time
+        self.white_increment = white_increment
+        self.black_increment = black_increment
+        self.moves_to_go = moves_to_go
+
+    def isBounded(self):
+        return (self.depth is not None or self.nodes is not None or self.move_time is not None
+                or self.white_time is not None or self.black_time is not None)
+
+    def timeLimits(self, white_to_move):
+        """
+        (soft, hard) limits in seconds of a move for the side to move, (None, None) without a time limit.
+        No new iteration is started after the soft limit, the search is stopped in the middle of one at the hard limit.
+        On a clock the move gets its share of the remaining time plus most of the increment as the soft limit and
+        a few times that as the hard limit, but never more than most of what is left on the clock.
+        """
+        if self.move_time is not None:
+            return self.move_time, self.move_time
+        remaining = self.white_time if white_to_move else self.black_time
+        if remaining is None:
+            return None, None
+        increment = self.white_increment if white_to_move else self.black_increment
+        moves_to_go = self.moves_to_go if self.moves_to_go else DEFAULT_MOVES_TO_GO
+        remaining = max(remaining - MOVE_OVERHEAD, 0.01)
+        soft = remaining / moves_to_go + increment * 3 / 4
+        hard = min(soft * HARD_LIMIT_FACTOR, remaining * 4 / 5)
+        return min(soft, hard), hard
+
+
+class Search:
+    def __init__(self, game_state, transposition_table=None, stop_event=None):
+        """
+        stop_event is an optional multiprocessing.Event, the search stops as soon as another process sets it.
+        """
+        self.game_state = game_state
+        self.transposition_table = transposition_table if transposition_table is not None else TranspositionTable()
+        self.move_ordering = MoveOrdering()
+        self.stop_event = stop_event
+        self.nodes = 0
+        self.stop_time = None
+        self.node_limit = None
+        self.stopped = False
+        self.tablebase_pieces = Tablebase.maxPieces()
+        self.tablebase_cuts = True  # if tablebase wins and losses end the search of a position like draws do
+
+    def checkTime(self):
+        """
+        Stop the search if the hard time limit or the node cap is reached or the stop_event is set.
+        """
+        if self.stop_time is not None and time.time() >= self.stop_time:
+            self.stopped = True
+        elif self.node_limit is not None and self.nodes >= self.node_limit:
+            self.stopped = True
+        elif self.stop_event is not None and self.stop_event.is_set():
+            self.stopped = True
+
+    def iterativeDeepening(self, limits=None, start_depth=1, report=None, new_generation=True):
+        """
+        Search to depth start_depth, start_depth + 1, ... until one of the SearchLimits is reached (no limits
+        searches to MAX_DEPTH or until the stop_event is set) and return the result of the last completed depth.
+        The first iteration always completes unless the stop_event is set, so there is a move even with a tiny
+        budget. report is called with a SearchResult after every completed depth.
+        new_generation starts a new generation of the transposition table, searches sharing the table for the same
+        move (see ParallelSearch) leave it to the caller.
+        """
+        start_time = time.time()
+        if new_generation:
+            self.transposition_table.newGeneration()
+        if limits is None:
+            limits = SearchLimits()
+        max_depth = limits.depth if limits.depth is not None else MAX_DEPTH
+        soft_limit, hard_limit = limits.timeLimits(self.game_state.white_to_move)
+        self.nodes = 0
+        self.stopped = False
+        self.stop_time = None
+        self.node_limit = None
+        root_moves = list(self.game_state.generateMoves())
+        if len(root_moves) == 0:
+            score = -CHECKMATE if self.game_state.in_check else STALEMATE
+            return SearchResult(None, score, 0, 0, time.time() - start_time)
+        self.tablebase_cuts = True
+        if popCount(self.game_state.bitboards.occupied) <= self.tablebase_pieces:
+            root_result = Tablebase.probe(self.game_state)
+            if root_result is not None:
+                root_moves = self.tablebaseRootMoves(root_moves, root_result)
+                if root_result == Tablebase.DRAW:  # any move that keeps the draw will do, no need to search
+                    return SearchResult(root_moves[0], DRAW, 0, 0, time.time() - start_time)
+                # the search still has to find the way to the mate, the results only score its leaves
+                self.tablebase_cuts = False
+
+        best_move, best_score, completed_depth = root_moves[0], 0, 0
+        for depth in range(min(start_depth, max_depth), max_depth + 1):
+            move, score = self.aspirationSearch(depth, root_moves, best_score)
+            if self.stopped:  # the unfinished iteration can't be trusted
+                break
+            best_move, best_score, completed_depth = move, score, depth
+            if report is not None:
+                report(SearchResult(best_move, best_score, completed_depth, self.nodes, time.time() - start_time))
+            # search the best move first in the next iteration, it is most likely to be the best again
+            root_moves.remove(move)
+            root_moves.insert(0, move)
+            if abs(score) >= MATE_THRESHOLD:  # forced mate found, deeper search won't change it
+                break
+            if soft_limit is not None and time.time() - start_time >= soft_limit:
+                break
+            if hard_limit is not None:
+                self.stop_time = start_time + hard_limit
+            self.node_limit = limits.nodes
+            self.checkTime()
+            if self.stopped:
+                break
+        return SearchResult(best_move, best_score, completed_depth, self.nodes, time.time() - start_time)
+
+    def principalVariation(self, best_move, max_length=MAX_DEPTH):
+        """
+        The best move followed by the moves the transposition table has for the positions after it, as long as they
+        are valid and no position repeats: the line the search expects, as a list of 16-bit moves.
+        """
+        game_state = self.game_state
+        line = []
+        move = best_move
+        while move and len(line) < max_length and move in list(game_state.generateMoves()):
+            game_state.makeEncodedMove(move)
+            line.append(move)
+            if game_state.isRepetition():
+                break
+            entry = self.transposition_table.probe(game_state.zobrist_key)
+            move = entry[3] if entry is not None else 0
+        for _ in line:
+            game_state.undoMove()
+        return line
+
+    def tablebaseRootMoves(self, root_moves, result):
+        """
+        The root moves that keep the tablebase result of the position, all of them if none does (in a lost one).
+        """
+        game_state = self.game_state
+        kept_moves = []
+        for move in root_moves:
+            game_state.makeEncodedMove(move)
+            child_result = Tablebase.probe(game_state)
+            game_state.undoMove()
+            if child_result is None or child_result == -result:  # None: the move ends the game
+                kept_moves.append(move)
+        return kept_moves if kept_moves else root_moves
+
+    def aspirationSearch(self, depth, root_moves, previous_score):
+        """
+        Search the root in a narrow window around the score of the previous iteration, a narrow window cuts off
+        more. If the score falls outside the window, it is searched again with the window widened on that side.
+        """
+        if depth < ASPIRATION_DEPTH or abs(previous_score) >= MATE_THRESHOLD:
+            return self.searchRoot(depth, root_moves, -INFINITY, INFINITY)
+        window = ASPIRATION_WINDOW
+        alpha = previous_score - window
+        beta = previous_score + window
+        while True:
+            move, score = self.searchRoot(depth, root_moves, alpha, beta)
+            if self.stopped:
+                return move, score
+            if score <= alpha:
+                window *= 4
+                alpha = max(score - window, -INFINITY)
+            elif score >= beta:
+                window *= 4
+                beta = min(score + window, INFINITY)
+            else:
+                return move, score
+
+    def searchRoot(self, depth, root_moves, alpha, beta):
+        """
+        Best root move and its score, a score outside of alpha and beta is only a bound like in negamax.
+        """
+        game_state = self.game_state
+        best_move = root_moves[0]
+        best_score = -INFINITY
+        for move in root_moves:
+            game_state.makeEncodedMove(move)
+            if best_score == -INFINITY:
+                score = -self.negamax(depth - 1, 1, -beta, -alpha)
+            else:  # principal variation search: prove the move is worse with a null window, search again if not
+                score = -self.negamax(depth - 1, 1, -alpha - 1, -alpha)
+                if alpha < score < beta:
+                    score = -self.negamax(depth - 1, 1, -beta, -alpha)
+            game_state.undoMove()
+            if self.stopped:
+                break
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_move, best_score
+
+    def negamax(self, depth, ply, alpha, beta, null_move_allowed=True):
+        """
+        Score of the position for the side to move, exact if it lies between alpha and beta.
+        Mates are scored CHECKMATE - ply, so that shorter mates are preferred.
+        The search is selective: it passes to see if the position is still good enough without a move (null-move
+        pruning), searches moves after the first with a null window (principal variation search) and searches
+        late quiet moves less deep unless they turn out to be good (late move reductions).
+        """
+        self.nodes += 1
+        if self.nodes & (POLL_INTERVAL - 1) == 0:
+            self.checkTime()
+        if self.stopped:
+            return 0
+        game_state = self.game_state
+        if game_state.halfmove_clock >= 100 or game_state.isRepetition():
+            return DRAW
+        if popCount(game_state.bitboards.occupied) <= self.tablebase_pieces:
+            result = Tablebase.probe(game_state)
+            if result is not None and (result == Tablebase.DRAW or self.tablebase_cuts or depth <= 0):
+                return tablebaseScore(game_state, result)
+        if depth <= 0:
+            self.nodes -= 1  # counted again by the quiescence search
+            return self.quiescence(ply, alpha, beta)
+
+        key = game_state.zobrist_key
+        hash_move = 0
+        entry = self.transposition_table.probe(key)
+        if entry is not None:
+            entry_depth, bound, score, hash_move = entry
+            if entry_depth >= depth:
+                score = scoreFromTable(score, ply)
+                if bound == EXACT or (bound == LOWER_BOUND and score >= beta) or (
+                        bound == UPPER_BOUND and score <= alpha):
+                    return score
+
+        in_check = game_state.inCheck()
+        principal_variation = beta - alpha > 1
+        if (null_move_allowed and not principal_variation and not in_check and depth >= NULL_MOVE_MIN_DEPTH
+                and hasPieces(game_state) and evaluate(game_state) >= beta):
+            # if passing still holds beta, a real move will too, except in zugzwang: never tried with pawns only
+            reduction = NULL_MOVE_REDUCTION + (depth > 6)
+            game_state.makeNullMove()
+            score = -self.negamax(depth - 1 - reduction, ply + 1, -beta, -beta + 1, False)
+            game_state.undoNullMove()
+            if self.stopped:
+                return 0
+            if score >= beta:
+                return beta if score >= MATE_THRESHOLD else score
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = 0
+        move_count = 0
+        killers = self.move_ordering.killers[ply]
+        # moves are generated lazily: after a cutoff the remaining moves are never built
+        for move in self.move_ordering.orderedMoves(game_state, hash_move, ply):
+            move_count += 1
+            game_state.makeEncodedMove(move)
+            if move_count == 1:
+                score = -self.negamax(depth - 1, ply + 1, -beta, -alpha)
+            else:
+                reduction = 0
+                if (move_count > LMR_MOVE_COUNT and depth >= LMR_MIN_DEPTH and not in_check
+                        and not move & (CAPTURE_BIT | PROMOTION_BIT) and move != killers[0] and move != killers[1]):
+                    reduction = 1 if move_count <= 2 * LMR_MOVE_COUNT else 2
+                score = -self.negamax(depth - 1 - reduction, ply + 1, -alpha - 1, -alpha)
+                if reduction and score > alpha:  # the reduced search was too shallow to trust
+                    score = -self.negamax(depth - 1, ply + 1, -alpha - 1, -alpha)
+                if alpha < score < beta:
+                    score = -self.negamax(depth - 1, ply + 1, -beta, -alpha)
+            game_state.undoMove()
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.move_ordering.updateCutoff(move, depth, ply, 0 if game_state.white_to_move else 1)
+                        break  # the opponent won't allow this position
+        if not best_move:  # no valid moves
+            return -CHECKMATE + ply if in_check else STALEMATE
+
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.transposition_table.store(key, depth, bound, scoreToTable(best_score, ply), best_move)
+        return best_score
+
+    def quiescence(self, ply, alpha, beta):
+        """
+        Search only captures and promotions from the position until it is quiet, so that the evaluation is never
+        taken in the middle of an exchange. The side to move may also stand pat: not capture at all and keep the
+        static evaluation. Captures that can't raise the score to alpha even with DELTA_MARGIN to spare and
+        captures that lose material in the exchange on their square are skipped.
+        """
+        self.nodes += 1
+        if self.nodes & (POLL_INTERVAL - 1) == 0:
+            self.checkTime()
+        if self.stopped:
+            return 0
+        game_state = self.game_state
+        stand_pat = evaluate(game_state)
+        if stand_pat >= beta or ply >= MAX_PLY - 1:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        moves = game_state.getTacticalMoves()
+        best_score = stand_pat
+        if not moves:
+            return best_score
+        # the static scores after the moves tell how much each can win at most before the opponent answers
+        scores = evaluateMoves(game_state, moves)
+        candidates = []
+        for move, score in zip(moves, scores):
+            if score + DELTA_MARGIN <= alpha:  # delta pruning
+                continue
+            if move & CAPTURE_BIT and not move & PROMOTION_BIT and game_state.staticExchange(move) < 0:
+                continue
+            candidates.append(move)
+        squares = game_state.bitboards.squares
+        color = 0 if game_state.white_to_move else 1
+        for move in self.move_ordering.pickMoves(candidates, 0, ply, squares, color):
+            game_state.makeEncodedMove(move)
+            score = -self.quiescence(ply + 1, -beta, -alpha)
+            game_state.undoMove()
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+
+def findBestMove(game_state, max_depth=MAX_DEPTH, time_limit=None, transposition_table=None, limits=None,
+                 opening_book=None):
+    """
+    Search the position of the game_state with a depth and/or time (in seconds) budget and return a SearchResult.
+    For clocks, increments or a node cap pass SearchLimits instead, max_depth and time_limit are then ignored.
+    The game_state is left as it was given. Pass the same transposition_table to keep it between moves.
+    With an OpeningBook, a move of the book is played without searching if the position is in it.
+    """
+    if limits is None:
+        limits = SearchLimits(depth=max_depth if max_depth != MAX_DEPTH else None, move_time=time_limit)
+    if not limits.isBounded():
+        raise ValueError("findBestMove needs a depth, node or time limit")
+    if opening_book is not None:
+        start_time = time.time()
+        book_move = opening_book.chooseMove(game_state)
+        if book_move is not None:
+            return SearchResult(book_move, 0, 0, 0, time.time() - start_time)
+    return Search(game_state, transposition_table).iterativeDeepening(limits)
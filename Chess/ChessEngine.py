@@ -4,6 +4,43 @@ Determining valid moves at current state.
 It will keep move log.
 """
 
+from Bitboard import Bitboards, PIECE_NAMES, EMPTY, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, \
+    WHITE_PAWN, BLACK_PAWN, WHITE_KNIGHT, BLACK_KNIGHT, WHITE_BISHOP, BLACK_BISHOP, WHITE_ROOK, BLACK_ROOK, \
+    WHITE_QUEEN, BLACK_QUEEN, WHITE_KING, BLACK_KING, FULL_BOARD, SQUARE_BITS, PIECE_CODES, iterateSquares, \
+    lowestSquare, popCount, squareRowCol
+from AttackTables import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BETWEEN, LINE, rookAttacks, bishopAttacks, \
+    queenAttacks
+from Zobrist import PIECE_KEYS, BLACK_TO_MOVE_KEY, CASTLING_KEYS, ENPASSANT_KEYS
+from Evaluation import PIECE_VALUES, PIECE_SQUARE_VALUES, pieceSquareScore
+from MoveEncoding import QUIET, DOUBLE_PAWN_PUSH, KING_CASTLE, QUEEN_CASTLE, CAPTURE, ENPASSANT_CAPTURE, \
+    PROMOTION, CAPTURE_BIT, NO_MOVE, encodeMove
+
+PROMOTION_LETTERS = "NBRQ"  # by the lowest two flag bits of a promotion
+
+# castle rights as a 4-bit mask
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+ALL_CASTLE_RIGHTS = 15
+# rights that are kept when a piece moves from or to the square: kings and rooks leaving home or rooks captured there
+CASTLE_RIGHTS_KEPT = [ALL_CASTLE_RIGHTS] * 64
+CASTLE_RIGHTS_KEPT[56] = ALL_CASTLE_RIGHTS ^ WHITE_QUEENSIDE  # a1
+CASTLE_RIGHTS_KEPT[63] = ALL_CASTLE_RIGHTS ^ WHITE_KINGSIDE  # h1
+CASTLE_RIGHTS_KEPT[60] = ALL_CASTLE_RIGHTS ^ WHITE_KINGSIDE ^ WHITE_QUEENSIDE  # e1
+CASTLE_RIGHTS_KEPT[0] = ALL_CASTLE_RIGHTS ^ BLACK_QUEENSIDE  # a8
+CASTLE_RIGHTS_KEPT[7] = ALL_CASTLE_RIGHTS ^ BLACK_KINGSIDE  # h8
+CASTLE_RIGHTS_KEPT[4] = ALL_CASTLE_RIGHTS ^ BLACK_KINGSIDE ^ BLACK_QUEENSIDE  # e8
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+FEN_PIECES = "PNBRQKpnbrqk"  # FEN letter of every piece code
+FEN_PIECE_CODES = {letter: code for code, letter in enumerate(FEN_PIECES)}
+FEN_EMPTY_SQUARES = {str(count): count for count in range(1, 9)}
+SQUARE_NAMES = ["abcdefgh"[square & 7] + str(8 - (square >> 3)) for square in range(64)]  # a8, b8, ..., h1
+SQUARE_INDICES = {name: square for square, name in enumerate(SQUARE_NAMES)}
+# castle right, its FEN letter and the home squares of the king and the rook, in FEN order
+CASTLING_FEN = [(WHITE_KINGSIDE, "K", 60, 63, WHITE_ROOK), (WHITE_QUEENSIDE, "Q", 60, 56, WHITE_ROOK),
+                (BLACK_KINGSIDE, "k", 4, 7, BLACK_ROOK), (BLACK_QUEENSIDE, "q", 4, 0, BLACK_ROOK)]
+
+SEE_KING_VALUE = 20000  # a king can only take last in an exchange, nothing may be able to take it back
+
 
 class GameState:
     def __init__(self):
@@ -12,8 +49,11 @@ class GameState:
         The first character represents the color of the piece: 'b' or 'w'.
         The second character represents the type of the piece: 'R', 'N', 'B', 'Q', 'K' or 'p'.
         "--" represents an empty space with no piece.
+        The position itself lives in the bitboards (one 64-bit set per piece plus occupancy masks),
+        board is built from them when the UI asks for it.
+        Moves are 16-bit integers (see MoveEncoding) inside the engine, Move objects are only made for the UI.
         """
-        self.board = [
+        board = [
             ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
             ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
             ["--", "--", "--", "--", "--", "--", "--", "--"],
@@ -22,266 +62,557 @@ class GameState:
             ["--", "--", "--", "--", "--", "--", "--", "--"],
             ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
             ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]]
-        self.moveFunctions = {"p": self.getPawnMoves, "R": self.getRookMoves, "N": self.getKnightMoves,
-                              "B": self.getBishopMoves, "Q": self.getQueenMoves, "K": self.getKingMoves}
+        self.bitboards = Bitboards.fromBoard(board)
+        self.attack_maps = [None, None]  # squares attacked by white and by black, built on demand per position
+        self.moveFunctions = {PAWN: self.getPawnMoves, ROOK: self.getRookMoves, KNIGHT: self.getKnightMoves,
+                              BISHOP: self.getBishopMoves, QUEEN: self.getQueenMoves}
         self.white_to_move = True
-        self.move_log = []
+        # every move made is logged as one integer holding everything needed to undo it: the 16-bit move,
+        # the moved piece in bits 16-19, the captured piece (EMPTY if none) in bits 20-23 and the castle rights,
+        # en-passant square and halfmove clock from before the move in bits 24-27, 28-33 and 34 up
+        self.move_stack = []
         self.white_king_location = (7, 4)
         self.black_king_location = (0, 4)
         self.checkmate = False
         self.stalemate = False
+        self.threefold_repetition = False
+        self.fifty_move_rule = False
+        self.insufficient_material = False
         self.in_check = False
-        self.pins = []
-        self.checks = []
-        self.enpassant_possible = ()  # coordinates for the square where en-passant capture is possible
-        self.enpassant_possible_log = [self.enpassant_possible]
-        self.current_castling_rights = CastleRights(True, True, True, True)
-        self.castle_rights_log = [CastleRights(self.current_castling_rights.wks, self.current_castling_rights.bks,
-                                               self.current_castling_rights.wqs, self.current_castling_rights.bqs)]
-        self.FEN_translator = {"r": "bR", "n": "bN", "b": "bB", "q": "bQ", "k": "bK", "p": "bp",
-                               "R": "wR", "N": "wN", "B": "wB", "Q": "wQ", "K": "wK", "P": "wp"}
+        self.pinned = 0  # bitboard of the pieces of the side to move pinned to their king
+        self.checkers = 0  # bitboard of the enemy pieces giving check
+        self.enpassant_square = 0  # square where en-passant capture is possible, 0 (a8 can never be one) if none
+        self.castling_rights = ALL_CASTLE_RIGHTS
+        self.halfmove_clock = 0  # moves by either side since the last capture or pawn move
+        self.start_ply = 0  # plies played before the position the move stack starts from, see fullmove_number
+        self.zobrist_key = self.computeZobristKey()  # 64-bit position hash, updated incrementally by every move
+        self.zobrist_key_log = [self.zobrist_key]
+        # material and piece-square bonuses from white's point of view (see Evaluation), updated by every move
+        self.piece_square_score = pieceSquareScore(self.bitboards)
+
+    @property
+    def board(self):
+        """
+        The position as an 8x8 board of two character piece names, built from the bitboards.
+        """
+        return self.bitboards.toBoard()
+
+    @property
+    def move_log(self):
+        """
+        The moves made so far as Move objects, built from the move stack for the UI and the notation.
+        """
+        return [Move.fromEncoded(record & 0xFFFF, PIECE_NAMES[record >> 16 & 15], PIECE_NAMES[record >> 20 & 15])
+                for record in self.move_stack]
 
     def FEN_to_board(self, FEN: str):
-        row = 0
-        column = 0
-        self.board = [
-            ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
-            ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
-            ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]]
-        for i in range(0, len(FEN)):
-            piece = FEN[i]
-            if piece == "/":
-                row += 1
-                column = 0
-            if piece in {"0", "1", "2", "3", "4", "5", "6", "7", "8"}:
-                value = int(piece)
-                for _ in range(0, value):
-                    self.board[row][column] = "--"
-                    column += 1
-            elif piece in self.FEN_translator:
-                pc = self.FEN_translator[piece]
-                self.board[row][column] = pc
-                column += 1
-            elif piece == " ":
-                piece = FEN[i+1]
-                self.white_to_move = True if piece == " w" else False
-                break
+        """
+        Set up the position of the FEN with all six fields: the pieces, the side to move, the castle rights,
+        the en-passant square and both move counters (missing fields at the end take their start position values).
+        The move log starts over from this position. Raises ValueError, leaving the game state as it was, if a field
+        is malformed or the position is impossible: not one king of each color, or the side not to move in check.
+        """
+        fields = FEN.split()
+        if not fields:
+            raise ValueError("empty FEN")
+        bitboards = Bitboards()
+        ranks = fields[0].split("/")
+        if len(ranks) != 8:
+            raise ValueError("FEN piece placement needs 8 ranks: " + fields[0])
+        square = 0
+        for rank in ranks:
+            rank_end = square + 8
+            for char in rank:
+                if char in FEN_EMPTY_SQUARES:
+                    square += FEN_EMPTY_SQUARES[char]
+                elif char in FEN_PIECE_CODES and square < rank_end:
+                    bitboards.putPiece(FEN_PIECE_CODES[char], square)
+                    square += 1
+                else:
+                    raise ValueError("invalid FEN piece placement: " + fields[0])
+            if square != rank_end:
+                raise ValueError("FEN rank needs 8 squares: " + rank)
+        pieces = bitboards.pieces
+        if popCount(pieces[WHITE_KING]) != 1 or popCount(pieces[BLACK_KING]) != 1:
+            raise ValueError("FEN needs one king of each color: " + fields[0])
+        side = fields[1] if len(fields) > 1 else "w"
+        if side not in ("w", "b"):
+            raise ValueError("FEN side to move must be w or b: " + side)
+        white_to_move = side == "w"
+        enpassant = fields[3] if len(fields) > 3 else "-"
+        if enpassant == "-":
+            enpassant_square = 0
+        elif enpassant in SQUARE_INDICES and enpassant[1] == ("6" if white_to_move else "3"):
+            enpassant_square = SQUARE_INDICES[enpassant]
+        else:
+            raise ValueError("FEN en-passant square must be - or on rank {}: {}".format(
+                6 if white_to_move else 3, enpassant))
+        try:
+            halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+            fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError("FEN move counters must be numbers: " + " ".join(fields[4:])) from None
+        enemy_king = lowestSquare(pieces[BLACK_KING if white_to_move else WHITE_KING])
+        previous_bitboards, self.bitboards = self.bitboards, bitboards
+        if self.attackersTo(enemy_king, white_to_move):
+            self.bitboards = previous_bitboards
+            raise ValueError("FEN has the side not to move in check: " + FEN)
+        self.white_king_location = squareRowCol(lowestSquare(pieces[WHITE_KING]))
+        self.black_king_location = squareRowCol(lowestSquare(pieces[BLACK_KING]))
+        self.white_to_move = white_to_move
+        castling = fields[2] if len(fields) > 2 else "-"
+        castling_rights = 0
+        for right, letter, king_square, rook_square, rook in CASTLING_FEN:
+            # a right without the king and the rook at home can't be used, drop it so that it is never tried
+            if letter in castling and bitboards.squares[king_square] == rook - ROOK + KING \
+                    and bitboards.squares[rook_square] == rook:
+                castling_rights |= right
+        self.castling_rights = castling_rights
+        self.enpassant_square = enpassant_square
+        self.halfmove_clock = halfmove_clock
+        self.start_ply = 2 * max(fullmove_number - 1, 0) + (not self.white_to_move)
+        self.attack_maps = [None, None]
+        self.move_stack = []
+        self.checkmate = False
+        self.stalemate = False
+        self.threefold_repetition = False
+        self.fifty_move_rule = False
+        self.insufficient_material = False
+        self.zobrist_key = self.computeZobristKey()
+        self.zobrist_key_log = [self.zobrist_key]
+        self.piece_square_score = pieceSquareScore(self.bitboards)
 
-    def board_to_FEN(self, board: list[list[str]]):
-        FEN = ''
-        board_translator = {self.FEN_translator[key]: key for key in self.FEN_translator}
-        row = 0
-        for chess_row in board:
+    def board_to_FEN(self, board=None):
+        """
+        FEN of the current position with all six fields. Given an 8x8 board of two character piece names instead,
+        its pieces are written in place of the current ones, the other fields still come from the game state.
+        """
+        if board is None:
+            squares = self.bitboards.squares
+        else:
+            squares = [PIECE_CODES[piece] for row in board for piece in row]
+        ranks = []
+        for rank_start in range(0, 64, 8):
+            rank = ""
             empty_counter = 0
-            row += 1
-            column = 0
-            for piece in chess_row:
-                column += 1
-                if piece == "--":
+            for piece in squares[rank_start:rank_start + 8]:
+                if piece == EMPTY:
                     empty_counter += 1
-                if empty_counter > 0 and (piece != "--" or column == 8):
-                    FEN += str(empty_counter)
-                    empty_counter = 0
-                if piece != "--":
-                    piece_FEN = board_translator[piece]
-                    FEN += piece_FEN
-            if row != 8:
-                FEN += '/'
-            else:
-                FEN += " w" if self.white_to_move else " b"
-        return FEN
+                else:
+                    if empty_counter:
+                        rank += str(empty_counter)
+                        empty_counter = 0
+                    rank += FEN_PIECES[piece]
+            if empty_counter:
+                rank += str(empty_counter)
+            ranks.append(rank)
+        castling = "".join(letter for right, letter, _, _, _ in CASTLING_FEN if self.castling_rights & right)
+        enpassant = SQUARE_NAMES[self.enpassant_square] if self.enpassant_square else "-"
+        return "{} {} {} {} {} {}".format("/".join(ranks), "w" if self.white_to_move else "b", castling or "-",
+                                          enpassant, self.halfmove_clock, self.fullmove_number)
+
+    @property
+    def fullmove_number(self):
+        """
+        Number of the current move as in the FEN, starting at 1 and going up after every move of black.
+        """
+        return (self.start_ply + len(self.move_stack)) // 2 + 1
+
+    def putPiece(self, piece, square):
+        self.bitboards.putPiece(piece, square)
+        self.zobrist_key ^= PIECE_KEYS[piece][square]
+        self.piece_square_score += PIECE_SQUARE_VALUES[piece][square]
+
+    def removePiece(self, square):
+        """
+        Take the piece off the square and return its code.
+        """
+        piece = self.bitboards.removePiece(square)
+        self.zobrist_key ^= PIECE_KEYS[piece][square]
+        self.piece_square_score -= PIECE_SQUARE_VALUES[piece][square]
+        return piece
+
+    def computeZobristKey(self):
+        """
+        Hash of the current position computed from scratch, makeMove and undoMove keep it up to date afterwards.
+        """
+        key = 0
+        for square, piece in enumerate(self.bitboards.squares):
+            if piece != EMPTY:
+                key ^= PIECE_KEYS[piece][square]
+        if not self.white_to_move:
+            key ^= BLACK_TO_MOVE_KEY
+        key ^= CASTLING_KEYS[self.castling_rights]
+        if self.enpassant_square:
+            key ^= ENPASSANT_KEYS[self.enpassant_square & 7]
+        return key
 
     def makeMove(self, move):
         """
         Takes a Move as a parameter and executes it.
-        (this will not work for castling, pawn promotion and en-passant)
         """
-        self.board[move.start_row][move.start_col] = "--"
-        self.board[move.end_row][move.end_col] = move.piece_moved
-        self.move_log.append(move)  # log the move so we can undo it later
+        self.makeEncodedMove(move.encoded)
+
+    def makeEncodedMove(self, move):
+        """
+        Execute a move given in its 16-bit encoding, including castling, promotion and en-passant.
+        """
+        start = move & 63
+        end = move >> 6 & 63
+        flags = move >> 12
+        squares = self.bitboards.squares
+        castling_rights = self.castling_rights
+        # take the side to move and en-passant file out of the hash, the new en-passant file is put in below
+        self.zobrist_key ^= BLACK_TO_MOVE_KEY
+        if self.enpassant_square:
+            self.zobrist_key ^= ENPASSANT_KEYS[self.enpassant_square & 7]
+
+        if flags == ENPASSANT_CAPTURE:
+            captured = self.removePiece((start & 56) | (end & 7))  # the pawn beside the start square
+        elif squares[end] != EMPTY:
+            captured = self.removePiece(end)
+        else:
+            captured = EMPTY
+        piece = self.removePiece(start)
+        if flags & PROMOTION:
+            self.putPiece(piece - PAWN + KNIGHT + (flags & 3), end)
+        else:
+            self.putPiece(piece, end)
+        # log the move with the state it can't be undone without, so we can undo it later
+        self.move_stack.append(move | piece << 16 | captured << 20 | castling_rights << 24 | self.enpassant_square << 28
+                               | self.halfmove_clock << 34)
         self.white_to_move = not self.white_to_move  # switch players
+        self.attack_maps[0] = self.attack_maps[1] = None
         # update king's location if moved
-        if move.piece_moved == "wK":
-            self.white_king_location = (move.end_row, move.end_col)
-        elif move.piece_moved == "bK":
-            self.black_king_location = (move.end_row, move.end_col)
+        if piece == WHITE_KING:
+            self.white_king_location = (end >> 3, end & 7)
+        elif piece == BLACK_KING:
+            self.black_king_location = (end >> 3, end & 7)
 
-        # pawn promotion
-        if move.is_pawn_promotion:
-            # if not is_AI:
-            #    promoted_piece = input("Promote to Q, R, B, or N:") #take this to UI later
-            #    self.board[move.end_row][move.end_col] = move.piece_moved[0] + promoted_piece
-            # else:
-            self.board[move.end_row][move.end_col] = move.piece_moved[0] + "Q"
-
-        # enpassant move
-        if move.is_enpassant_move:
-            self.board[move.start_row][move.end_col] = "--"  # capturing the pawn
-
-        # update enpassant_possible variable
-        if move.piece_moved[1] == "p" and abs(move.start_row - move.end_row) == 2:  # only on 2 square pawn advance
-            self.enpassant_possible = ((move.start_row + move.end_row) // 2, move.start_col)
+        # castle move, the rook jumps over the king
+        if flags == KING_CASTLE:
+            self.putPiece(self.removePiece(end + 1), end - 1)
+        elif flags == QUEEN_CASTLE:
+            self.putPiece(self.removePiece(end - 2), end + 1)
+
+        # update the en-passant square
+        if flags == DOUBLE_PAWN_PUSH:
+            self.enpassant_square = (start + end) >> 1
+            self.zobrist_key ^= ENPASSANT_KEYS[start & 7]
         else:
-            self.enpassant_possible = ()
+            self.enpassant_square = 0
 
-        # castle move
-        if move.is_castle_move:
-            if move.end_col - move.start_col == 2:  # king-side castle move
-                self.board[move.end_row][move.end_col - 1] = self.board[move.end_row][
-                    move.end_col + 1]  # moves the rook to its new square
-                self.board[move.end_row][move.end_col + 1] = '--'  # erase old rook
-            else:  # queen-side castle move
-                self.board[move.end_row][move.end_col + 1] = self.board[move.end_row][
-                    move.end_col - 2]  # moves the rook to its new square
-                self.board[move.end_row][move.end_col - 2] = '--'  # erase old rook
-
-        self.enpassant_possible_log.append(self.enpassant_possible)
-
-        # update castling rights - whenever it is a rook or king move
-        self.updateCastleRights(move)
-        self.castle_rights_log.append(CastleRights(self.current_castling_rights.wks, self.current_castling_rights.bks,
-                                                   self.current_castling_rights.wqs, self.current_castling_rights.bqs))
+        if piece % 6 == PAWN or captured != EMPTY:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+
+        # update castling rights - whenever a king or rook leaves its square or a rook is captured on it
+        self.castling_rights = castling_rights & CASTLE_RIGHTS_KEPT[start] & CASTLE_RIGHTS_KEPT[end]
+        if self.castling_rights != castling_rights:
+            self.zobrist_key ^= CASTLING_KEYS[castling_rights] ^ CASTLING_KEYS[self.castling_rights]
+        self.zobrist_key_log.append(self.zobrist_key)
 
     def undoMove(self):
         """
         Undo the last move
         """
-        if len(self.move_log) != 0:  # make sure that there is a move to undo
-            move = self.move_log.pop()
-            self.board[move.start_row][move.start_col] = move.piece_moved
-            self.board[move.end_row][move.end_col] = move.piece_captured
+        if len(self.move_stack) != 0:  # make sure that there is a move to undo
+            record = self.move_stack.pop()
+            start = record & 63
+            end = record >> 6 & 63
+            flags = record >> 12 & 15
+            piece = record >> 16 & 15
+            captured = record >> 20 & 15
+            # the hash comes from the log, so the bitboards are changed directly and only the score is updated
+            bitboards = self.bitboards
+            score = self.piece_square_score - PIECE_SQUARE_VALUES[bitboards.removePiece(end)][end]
+            bitboards.putPiece(piece, start)
+            score += PIECE_SQUARE_VALUES[piece][start]
+            if flags == ENPASSANT_CAPTURE:
+                bitboards.putPiece(captured, (start & 56) | (end & 7))
+                score += PIECE_SQUARE_VALUES[captured][(start & 56) | (end & 7)]
+            elif captured != EMPTY:
+                bitboards.putPiece(captured, end)
+                score += PIECE_SQUARE_VALUES[captured][end]
             self.white_to_move = not self.white_to_move  # swap players
+            self.attack_maps[0] = self.attack_maps[1] = None
             # update the king's position if needed
-            if move.piece_moved == "wK":
-                self.white_king_location = (move.start_row, move.start_col)
-            elif move.piece_moved == "bK":
-                self.black_king_location = (move.start_row, move.start_col)
-            # undo en passant move
-            if move.is_enpassant_move:
-                self.board[move.end_row][move.end_col] = "--"  # leave landing square blank
-                self.board[move.start_row][move.end_col] = move.piece_captured
-
-            self.enpassant_possible_log.pop()
-            self.enpassant_possible = self.enpassant_possible_log[-1]
-
-            # undo castle rights
-            self.castle_rights_log.pop()  # get rid of the new castle rights from the move we are undoing
-            self.current_castling_rights = self.castle_rights_log[
-                -1]  # set the current castle rights to the last one in the list
+            if piece == WHITE_KING:
+                self.white_king_location = (start >> 3, start & 7)
+            elif piece == BLACK_KING:
+                self.black_king_location = (start >> 3, start & 7)
             # undo the castle move
-            if move.is_castle_move:
-                if move.end_col - move.start_col == 2:  # king-side
-                    self.board[move.end_row][move.end_col + 1] = self.board[move.end_row][move.end_col - 1]
-                    self.board[move.end_row][move.end_col - 1] = '--'
-                else:  # queen-side
-                    self.board[move.end_row][move.end_col - 2] = self.board[move.end_row][move.end_col + 1]
-                    self.board[move.end_row][move.end_col + 1] = '--'
+            if flags == KING_CASTLE:
+                rook = bitboards.removePiece(end - 1)
+                bitboards.putPiece(rook, end + 1)
+                score += PIECE_SQUARE_VALUES[rook][end + 1] - PIECE_SQUARE_VALUES[rook][end - 1]
+            elif flags == QUEEN_CASTLE:
+                rook = bitboards.removePiece(end + 1)
+                bitboards.putPiece(rook, end - 2)
+                score += PIECE_SQUARE_VALUES[rook][end - 2] - PIECE_SQUARE_VALUES[rook][end + 1]
+            self.piece_square_score = score
+
+            self.castling_rights = record >> 24 & 15
+            self.enpassant_square = record >> 28 & 63
+            self.halfmove_clock = record >> 34
+            self.zobrist_key_log.pop()
+            self.zobrist_key = self.zobrist_key_log[-1]
             self.checkmate = False
             self.stalemate = False
+            self.threefold_repetition = False
+            self.fifty_move_rule = False
+            self.insufficient_material = False
+
+    def makeNullMove(self):
+        """
+        Pass: give the move to the other side without moving a piece, for null-move pruning in the search.
+        Only undoNullMove may undo it.
+        """
+        self.move_stack.append(NO_MOVE | self.castling_rights << 24 | self.enpassant_square << 28
+                               | self.halfmove_clock << 34)
+        self.zobrist_key ^= BLACK_TO_MOVE_KEY
+        if self.enpassant_square:
+            self.zobrist_key ^= ENPASSANT_KEYS[self.enpassant_square & 7]
+            self.enpassant_square = 0
+        self.white_to_move = not self.white_to_move
+        # no position before a pass can repeat after it in a real game, so the repetition scan stops here;
+        # the fifty-move count starts over below the null move as well
+        self.halfmove_clock = 0
+        self.zobrist_key_log.append(self.zobrist_key)  # the attack maps stay, no piece has moved
 
-    def updateCastleRights(self, move):
-        """
-        Update the castle rights given the move
-        """
-        if move.piece_captured == "wR":
-            if move.end_col == 0:  # left rook
-                self.current_castling_rights.wqs = False
-            elif move.end_col == 7:  # right rook
-                self.current_castling_rights.wks = False
-        elif move.piece_captured == "bR":
-            if move.end_col == 0:  # left rook
-                self.current_castling_rights.bqs = False
-            elif move.end_col == 7:  # right rook
-                self.current_castling_rights.bks = False
-
-        if move.piece_moved == 'wK':
-            self.current_castling_rights.wqs = False
-            self.current_castling_rights.wks = False
-        elif move.piece_moved == 'bK':
-            self.current_castling_rights.bqs = False
-            self.current_castling_rights.bks = False
-        elif move.piece_moved == 'wR':
-            if move.start_row == 7:
-                if move.start_col == 0:  # left rook
-                    self.current_castling_rights.wqs = False
-                elif move.start_col == 7:  # right rook
-                    self.current_castling_rights.wks = False
-        elif move.piece_moved == 'bR':
-            if move.start_row == 0:
-                if move.start_col == 0:  # left rook
-                    self.current_castling_rights.bqs = False
-                elif move.start_col == 7:  # right rook
-                    self.current_castling_rights.bks = False
+    def undoNullMove(self):
+        record = self.move_stack.pop()
+        self.enpassant_square = record >> 28 & 63
+        self.halfmove_clock = record >> 34
+        self.white_to_move = not self.white_to_move
+        self.zobrist_key_log.pop()
+        self.zobrist_key = self.zobrist_key_log[-1]
+
+    def repetitionCount(self, limit=None):
+        """
+        Number of times the current position occurred before in the game, the scan stops once limit are found.
+        Only positions since the last capture or pawn move can be the same, so the key log is scanned back just
+        that far, and only at every second entry, where the same side was to move.
+        """
+        key_log = self.zobrist_key_log
+        key = self.zobrist_key
+        last = len(key_log) - 1
+        count = 0
+        for index in range(last - 4, max(last - self.halfmove_clock, 0) - 1, -2):
+            if key_log[index] == key:
+                count += 1
+                if count == limit:
+                    break
+        return count
+
+    def isRepetition(self):
+        """
+        Determine if the current position occurred before, the search scores a position repeated once as a draw.
+        """
+        return self.repetitionCount(1) == 1
+
+    def hasInsufficientMaterial(self):
+        """
+        Determine if neither side can ever checkmate: only the kings and at most one knight or bishop are left.
+        """
+        pieces = self.bitboards.pieces
+        if pieces[WHITE_PAWN] | pieces[BLACK_PAWN] | pieces[WHITE_ROOK] | pieces[BLACK_ROOK] \
+                | pieces[WHITE_QUEEN] | pieces[BLACK_QUEEN]:
+            return False
+        return popCount(pieces[WHITE_KNIGHT] | pieces[BLACK_KNIGHT] | pieces[WHITE_BISHOP] | pieces[BLACK_BISHOP]) <= 1
 
     def getValidMoves(self):
         """
-        All moves considering checks.
+        All moves considering checks, as Move objects.
+        Also finds out if the game is over: checkmate, stalemate, threefold repetition, the fifty-move rule or
+        insufficient material.
         """
-        temp_castle_rights = CastleRights(self.current_castling_rights.wks, self.current_castling_rights.bks,
-                                          self.current_castling_rights.wqs, self.current_castling_rights.bqs)
-        # advanced algorithm
-        moves = []
-        self.in_check, self.pins, self.checks = self.checkForPinsAndChecks()
+        moves = list(self.generateMoves())
+        self.checkmate = False
+        self.stalemate = False
+        self.threefold_repetition = False
+        self.fifty_move_rule = False
+        self.insufficient_material = False
+        if len(moves) == 0:
+            if self.in_check:
+                self.checkmate = True
+            else:
+                self.stalemate = True
+        elif self.halfmove_clock >= 100:
+            self.fifty_move_rule = True
+        elif self.repetitionCount(2) == 2:
+            self.threefold_repetition = True
+        elif self.hasInsufficientMaterial():
+            self.insufficient_material = True
+        return [self.decodeMove(move) for move in moves]
 
-        if self.white_to_move:
-            king_row = self.white_king_location[0]
-            king_col = self.white_king_location[1]
+    def decodeMove(self, move):
+        """
+        Move object for a 16-bit move that is valid in the current position.
+        """
+        squares = self.bitboards.squares
+        piece = squares[move & 63]
+        if move >> 12 == ENPASSANT_CAPTURE:
+            captured = BLACK_PAWN if piece == WHITE_PAWN else WHITE_PAWN
+        else:
+            captured = squares[move >> 6 & 63]
+        return Move.fromEncoded(move, PIECE_NAMES[piece], PIECE_NAMES[captured])
+
+    @staticmethod
+    def moveToUCI(move):
+        """
+        A 16-bit move in the coordinate notation of the UCI protocol, e.g. e2e4 or e7e8q.
+        """
+        notation = SQUARE_NAMES[move & 63] + SQUARE_NAMES[move >> 6 & 63]
+        return notation + PROMOTION_LETTERS[move >> 12 & 3].lower() if move >> 12 & PROMOTION else notation
+
+    def moveToSAN(self, move):
+        """
+        A 16-bit move that is valid in the current position in standard algebraic notation, e.g. Nbd7, exd6, e8=Q+
+        or O-O#. The move is made and undone to find out if it gives check or mate.
+        """
+        start = move & 63
+        end = move >> 6 & 63
+        flags = move >> 12
+        squares = self.bitboards.squares
+        piece = squares[start]
+        capture = "x" if move & CAPTURE_BIT else ""
+        if flags == KING_CASTLE:
+            notation = "O-O"
+        elif flags == QUEEN_CASTLE:
+            notation = "O-O-O"
+        elif piece % 6 == PAWN:
+            notation = (SQUARE_NAMES[start][0] + capture if capture else "") + SQUARE_NAMES[end]
+            if flags & PROMOTION:
+                notation += "=" + PROMOTION_LETTERS[flags & 3]
         else:
-            king_row = self.black_king_location[0]
-            king_col = self.black_king_location[1]
-        if self.in_check:
-            if len(self.checks) == 1:  # only 1 check, block the check or move the king
-                moves = self.getAllPossibleMoves()
-                # to block the check you must put a piece into one of the squares between the enemy piece and your king
-                check = self.checks[0]  # check information
-                check_row = check[0]
-                check_col = check[1]
-                piece_checking = self.board[check_row][check_col]
-                valid_squares = []  # squares that pieces can move to
-                # if knight, must capture the knight or move your king, other pieces can be blocked
-                if piece_checking[1] == "N":
-                    valid_squares = [(check_row, check_col)]
+            notation = PIECE_NAMES[piece][1]
+            # name the file, else the rank, else both of the start square if another such piece can go there too
+            others = [other & 63 for other in self.generateMoves()
+                      if other >> 6 & 63 == end and other & 63 != start and squares[other & 63] == piece]
+            if others:
+                if all(other & 7 != start & 7 for other in others):
+                    notation += SQUARE_NAMES[start][0]
+                elif all(other >> 3 != start >> 3 for other in others):
+                    notation += SQUARE_NAMES[start][1]
                 else:
-                    for i in range(1, 8):
-                        valid_square = (king_row + check[2] * i,
-                                        king_col + check[3] * i)  # check[2] and check[3] are the check directions
-                        valid_squares.append(valid_square)
-                        if valid_square[0] == check_row and valid_square[
-                            1] == check_col:  # once you get to piece and check
-                            break
-                # get rid of any moves that don't block check or move king
-                for i in range(len(moves) - 1, -1, -1):  # iterate through the list backwards when removing elements
-                    if moves[i].piece_moved[1] != "K":  # move doesn't move king so it must block or capture
-                        if not (moves[i].end_row,
-                                moves[i].end_col) in valid_squares:  # move doesn't block or capture piece
-                            moves.remove(moves[i])
-            else:  # double check, king has to move
-                self.getKingMoves(king_row, king_col, moves)
-        else:  # not in check - all moves are fine
-            moves = self.getAllPossibleMoves()
+                    notation += SQUARE_NAMES[start]
+            notation += capture + SQUARE_NAMES[end]
+        self.makeEncodedMove(move)
+        if self.inCheck():
+            notation += "+" if next(self.generateMoves(), None) is not None else "#"
+        self.undoMove()
+        return notation
+
+    def parseMove(self, notation):
+        """
+        The 16-bit move of the current position written in UCI or standard algebraic notation, None if there is none.
+        Check marks and annotations like + # ! ? are ignored, castling can be written with zeros as well.
+        """
+        moves = list(self.generateMoves())
+        for move in moves:
+            if self.moveToUCI(move) == notation:
+                return move
+        notation = notation.rstrip("+#!?").replace("0", "O")
+        for move in moves:
+            if self.moveToSAN(move).rstrip("+#") == notation:
+                return move
+        return None
+
+    def generateMoves(self):
+        """
+        Yield all moves considering checks, in stages: the captures of generateCaptures, then the quiet moves and
+        castling of generateQuiets. The quiet stage is only generated once all captures have been taken.
+        """
+        yield from self.generateCaptures()
+        yield from self.generateQuiets()
+
+    def generateCaptures(self):
+        """
+        All legal captures, en-passant included, the first stage of generateMoves.
+        Every stage is already legal: pinned pieces stay on their pin line and, in check, pieces can only
+        capture the checking piece or block it while the king moves to squares that aren't attacked.
+        """
+        self.in_check, self.pinned, self.checkers = self.checkForPinsAndChecks()
+        return self.getStageMoves(self.bitboards.colors[BLACK if self.white_to_move else WHITE],
+                                  self.getEvasionMask(self.checkers))
+
+    def generateQuiets(self):
+        """
+        All legal moves that capture nothing, castling last, the second stage of generateMoves.
+        The pins and checkers are found again, the moves searched since the captures were generated change them.
+        """
+        self.in_check, self.pinned, self.checkers = self.checkForPinsAndChecks()
+        moves = self.getStageMoves(~self.bitboards.occupied & FULL_BOARD, self.getEvasionMask(self.checkers))
+        if not self.in_check:
             if self.white_to_move:
                 self.getCastleMoves(self.white_king_location[0], self.white_king_location[1], moves)
             else:
                 self.getCastleMoves(self.black_king_location[0], self.black_king_location[1], moves)
+        return moves
 
-        if len(moves) == 0:
-            if self.inCheck():
-                self.checkmate = True
-            else:
-                # TODO stalemate on repeated moves
-                self.stalemate = True
+    def getTacticalMoves(self):
+        """
+        All legal captures and promotions, the moves quiescence search looks at.
+        """
+        self.in_check, self.pinned, self.checkers = self.checkForPinsAndChecks()
+        evasion_mask = self.getEvasionMask(self.checkers)
+        bitboards = self.bitboards
+        moves = self.getStageMoves(bitboards.colors[BLACK if self.white_to_move else WHITE], evasion_mask)
+        # the pawn pushes to the last row, the captures promoting are already there
+        if self.white_to_move:
+            pawns, promotion_row = bitboards.pieces[WHITE_PAWN] & 0xFF00, 0xFF
         else:
-            self.checkmate = False
-            self.stalemate = False
+            pawns, promotion_row = bitboards.pieces[BLACK_PAWN] & 0xFF << 48, 0xFF << 56
+        for square in iterateSquares(pawns):
+            self.getPawnMoves(square, moves, promotion_row & ~bitboards.occupied & evasion_mask)
+        return moves
 
-        self.current_castling_rights = temp_castle_rights
+    def getEvasionMask(self, checkers):
+        """
+        Squares a piece other than the king can move to: anywhere if not in check, the checking piece or
+        the squares between it and the king in a single check, nowhere in a double check.
+        """
+        if not checkers:
+            return FULL_BOARD
+        if checkers & (checkers - 1):
+            return 0
+        king_row, king_col = self.white_king_location if self.white_to_move else self.black_king_location
+        return BETWEEN[king_row * 8 + king_col][lowestSquare(checkers)] | checkers
+
+    def getStageMoves(self, targets, evasion_mask):
+        """
+        Legal moves (castling aside) ending on a square of targets, using the pins of the position.
+        """
+        moves = []
+        pieces = self.bitboards.pieces
+        first_piece = 0 if self.white_to_move else 6
+        if evasion_mask:
+            for piece_type in range(KING):  # every piece but the king
+                move_function = self.moveFunctions[piece_type]
+                for square in iterateSquares(pieces[first_piece + piece_type]):
+                    move_function(square, moves, targets & evasion_mask)
+        self.getKingMoves(lowestSquare(pieces[first_piece + KING]), moves, targets)
         return moves
 
+    def isValidMove(self, move):
+        """
+        Determine if the 16-bit move is valid in this position, castling moves are never found valid.
+        Only the moves of the piece standing on the start square are generated.
+        """
+        start = move & 63
+        piece = self.bitboards.squares[start]
+        if piece == EMPTY or (piece < 6) != self.white_to_move:
+            return False
+        self.in_check, self.pinned, self.checkers = self.checkForPinsAndChecks()
+        moves = []
+        if piece % 6 == KING:
+            self.getKingMoves(start, moves)
+        else:
+            self.moveFunctions[piece % 6](start, moves, self.getEvasionMask(self.checkers))
+        return move in moves
+
     def inCheck(self):
         """
         Determine if a current player is in check
@@ -295,328 +626,300 @@ class GameState:
         """
         Determine if enemy can attack the square row col
         """
-        self.white_to_move = not self.white_to_move  # switch to opponent's point of view
-        opponents_moves = self.getAllPossibleMoves()
-        self.white_to_move = not self.white_to_move
-        for move in opponents_moves:
-            if move.end_row == row and move.end_col == col:  # square is under attack
-                return True
-        return False
+        return self.isSquareAttacked(row * 8 + col, not self.white_to_move)
 
-    def getAllPossibleMoves(self):
+    def attackersTo(self, square, white, occupied=None):
         """
-        All moves without considering checks.
+        Bitboard of the pieces of the given color attacking the square.
+        Instead of generating the attacks of every piece, look outwards from the square itself:
+        a knight attacks the square exactly when a knight on the square would attack the knight, and so on.
         """
-        moves = []
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                turn = self.board[row][col][0]
-                if (turn == "w" and self.white_to_move) or (turn == "b" and not self.white_to_move):
-                    piece = self.board[row][col][1]
-                    self.moveFunctions[piece](row, col, moves)  # calls appropriate move function based on piece type
-        return moves
+        pieces = self.bitboards.pieces
+        if occupied is None:
+            occupied = self.bitboards.occupied
+        color = WHITE if white else BLACK
+        first_piece = color * 6
+        return (PAWN_ATTACKS[1 - color][square] & pieces[first_piece + PAWN]
+                | KNIGHT_ATTACKS[square] & pieces[first_piece + KNIGHT]
+                | KING_ATTACKS[square] & pieces[first_piece + KING]
+                | bishopAttacks(square, occupied) & (pieces[first_piece + BISHOP] | pieces[first_piece + QUEEN])
+                | rookAttacks(square, occupied) & (pieces[first_piece + ROOK] | pieces[first_piece + QUEEN]))
+
+    def staticExchange(self, move):
+        """
+        Material the side to move wins (or loses, if negative) with the capture when both sides keep taking back
+        on its square with their least valuable piece, as long as that is good for them.
+        Pieces that capture are taken off the occupancy, so the sliders behind them join in.
+        """
+        start = move & 63
+        end = move >> 6 & 63
+        bitboards = self.bitboards
+        pieces = bitboards.pieces
+        occupied = bitboards.occupied ^ SQUARE_BITS[start]
+        if move >> 12 == ENPASSANT_CAPTURE:
+            gains = [PIECE_VALUES[PAWN]]
+            occupied ^= SQUARE_BITS[(start & 56) | (end & 7)]
+        else:
+            gains = [PIECE_VALUES[bitboards.squares[end] % 6]]
+        attacker_type = bitboards.squares[start] % 6
+        attacker_value = SEE_KING_VALUE if attacker_type == KING else PIECE_VALUES[attacker_type]
+        white = not self.white_to_move
+        while True:
+            attackers = self.attackersTo(end, white, occupied) & occupied
+            if not attackers:
+                break
+            first_piece = 0 if white else 6
+            for attacker_type in range(6):
+                attacker_bits = attackers & pieces[first_piece + attacker_type]
+                if attacker_bits:
+                    break
+            gains.append(attacker_value - gains[-1])  # taking the last attacker back, with gains[-1] at stake
+            occupied ^= attacker_bits & -attacker_bits
+            attacker_value = SEE_KING_VALUE if attacker_type == KING else PIECE_VALUES[attacker_type]
+            white = not white
+        # every side stops taking back once it would lose by going on
+        while len(gains) > 1:
+            last_gain = gains.pop()
+            gains[-1] = -max(-gains[-1], last_gain)
+        return gains[0]
+
+    def isSquareAttacked(self, square, white):
+        """
+        Determine if any piece of the given color attacks the square, stopping at the first attacker found.
+        """
+        color = WHITE if white else BLACK
+        if self.attack_maps[color] is not None:  # answer from the attack map if this position has one
+            return self.attack_maps[color] & SQUARE_BITS[square] != 0
+        pieces = self.bitboards.pieces
+        first_piece = color * 6
+        if KNIGHT_ATTACKS[square] & pieces[first_piece + KNIGHT]:
+            return True
+        if PAWN_ATTACKS[1 - color][square] & pieces[first_piece + PAWN]:
+            return True
+        if KING_ATTACKS[square] & pieces[first_piece + KING]:
+            return True
+        occupied = self.bitboards.occupied
+        queens = pieces[first_piece + QUEEN]
+        return (bishopAttacks(square, occupied) & (pieces[first_piece + BISHOP] | queens)
+                or rookAttacks(square, occupied) & (pieces[first_piece + ROOK] | queens)) != 0
+
+    def attackedSquares(self, white, occupied=None):
+        """
+        Bitboard of all squares attacked by the pieces of the given color, looked up in the attack tables.
+        The map is cached for the current position, makeMove and undoMove throw it away.
+        A map for other occupied squares than the board's isn't cached.
+        """
+        color = WHITE if white else BLACK
+        if occupied is None and self.attack_maps[color] is not None:
+            return self.attack_maps[color]
+        bitboards = self.bitboards
+        pieces = bitboards.pieces
+        cache = occupied is None
+        if cache:
+            occupied = bitboards.occupied
+        first_piece = color * 6
+        attacks = 0
+        for square in iterateSquares(pieces[first_piece + PAWN]):
+            attacks |= PAWN_ATTACKS[color][square]
+        for square in iterateSquares(pieces[first_piece + KNIGHT]):
+            attacks |= KNIGHT_ATTACKS[square]
+        for square in iterateSquares(pieces[first_piece + BISHOP] | pieces[first_piece + QUEEN]):
+            attacks |= bishopAttacks(square, occupied)
+        for square in iterateSquares(pieces[first_piece + ROOK] | pieces[first_piece + QUEEN]):
+            attacks |= rookAttacks(square, occupied)
+        for square in iterateSquares(pieces[first_piece + KING]):
+            attacks |= KING_ATTACKS[square]
+        if cache:
+            self.attack_maps[color] = attacks
+        return attacks
 
     def checkForPinsAndChecks(self):
-        pins = []  # squares pinned and the direction its pinned from
-        checks = []  # squares where enemy is applying a check
-        in_check = False
+        """
+        (in check, pinned, checkers) for the side to move, pinned and checkers as bitboards.
+        A piece is pinned if it is the only piece between its king and an enemy slider looking at the king.
+        """
         if self.white_to_move:
-            enemy_color = "b"
-            ally_color = "w"
-            start_row = self.white_king_location[0]
-            start_col = self.white_king_location[1]
+            ally, enemy = WHITE, BLACK
+            king_row, king_col = self.white_king_location
         else:
-            enemy_color = "w"
-            ally_color = "b"
-            start_row = self.black_king_location[0]
-            start_col = self.black_king_location[1]
-        # check outwards from king for pins and checks, keep track of pins
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
-        for j in range(len(directions)):
-            direction = directions[j]
-            possible_pin = ()  # reset possible pins
-            for i in range(1, 8):
-                end_row = start_row + direction[0] * i
-                end_col = start_col + direction[1] * i
-                if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece[0] == ally_color and end_piece[1] != "K":
-                        if possible_pin == ():  # first allied piece could be pinned
-                            possible_pin = (end_row, end_col, direction[0], direction[1])
-                        else:  # 2nd allied piece - no check or pin from this direction
-                            break
-                    elif end_piece[0] == enemy_color:
-                        enemy_type = end_piece[1]
-                        # 5 possibilities in this complex conditional
-                        # 1.) orthogonally away from king and piece is a rook
-                        # 2.) diagonally away from king and piece is a bishop
-                        # 3.) 1 square away diagonally from king and piece is a pawn
-                        # 4.) any direction and piece is a queen
-                        # 5.) any direction 1 square away and piece is a king
-                        if (0 <= j <= 3 and enemy_type == "R") or (4 <= j <= 7 and enemy_type == "B") or (
-                                i == 1 and enemy_type == "p" and (
-                                (enemy_color == "w" and 6 <= j <= 7) or (enemy_color == "b" and 4 <= j <= 5))) or (
-                                enemy_type == "Q") or (i == 1 and enemy_type == "K"):
-                            if possible_pin == ():  # no piece blocking, so check
-                                in_check = True
-                                checks.append((end_row, end_col, direction[0], direction[1]))
-                                break
-                            else:  # piece blocking so pin
-                                pins.append(possible_pin)
-                                break
-                        else:  # enemy piece not applying checks
-                            break
-                else:
-                    break  # off board
-        # check for knight checks
-        knight_moves = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2))
-        for move in knight_moves:
-            end_row = start_row + move[0]
-            end_col = start_col + move[1]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] == enemy_color and end_piece[1] == "N":  # enemy knight attacking a king
-                    in_check = True
-                    checks.append((end_row, end_col, move[0], move[1]))
-        return in_check, pins, checks
-
-    def getPawnMoves(self, row, col, moves):
-        """
-        Get all the pawn moves for the pawn located at row, col and add the moves to the list.
-        """
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+            ally, enemy = BLACK, WHITE
+            king_row, king_col = self.black_king_location
+        king_square = king_row * 8 + king_col
+        bitboards = self.bitboards
+        pieces = bitboards.pieces
+        enemy_piece = enemy * 6
+        occupied = bitboards.occupied
+        checkers = self.attackersTo(king_square, enemy == WHITE, occupied)
+        pinned = 0
+        # look outwards from king through the allied pieces on its rays, a slider right behind one pins it
+        rook_sliders = pieces[enemy_piece + ROOK] | pieces[enemy_piece + QUEEN]
+        bishop_sliders = pieces[enemy_piece + BISHOP] | pieces[enemy_piece + QUEEN]
+        for sliders, attacks in ((rook_sliders, rookAttacks), (bishop_sliders, bishopAttacks)):
+            if not sliders:
+                continue
+            king_rays = attacks(king_square, occupied)
+            blockers = king_rays & bitboards.colors[ally]
+            for square in iterateSquares(attacks(king_square, occupied ^ blockers) & sliders & ~king_rays):
+                pinned |= BETWEEN[king_square][square] & blockers
+        return checkers != 0, pinned, checkers
+
+    def getPinMask(self, square):
+        """
+        Squares the piece on the square may move to without exposing its king, FULL_BOARD if it isn't pinned.
+        """
+        if self.pinned & SQUARE_BITS[square]:
+            king_row, king_col = self.white_king_location if self.white_to_move else self.black_king_location
+            return LINE[king_row * 8 + king_col][square]
+        return FULL_BOARD
+
+    def kingDangerSquares(self):
+        """
+        Squares the king of the side to move can't go to: the squares the enemy attacks, looking through the king
+        when a slider gives check, since the king stepping back along the line would still be in check.
+        """
+        white = not self.white_to_move
+        pieces = self.bitboards.pieces
+        enemy_piece = (WHITE if white else BLACK) * 6
+        sliders = pieces[enemy_piece + BISHOP] | pieces[enemy_piece + ROOK] | pieces[enemy_piece + QUEEN]
+        if not self.checkers & sliders:
+            return self.attackedSquares(white)
+        king = pieces[(BLACK if white else WHITE) * 6 + KING]
+        return self.attackedSquares(white, self.bitboards.occupied ^ king)
+
+    def addMoves(self, start, targets, moves):
+        """
+        Add a move from start to every square of the targets bitboard, flagging the captures.
+        """
+        enemy_pieces = self.bitboards.colors[BLACK if self.white_to_move else WHITE]
+        for end in iterateSquares(targets & enemy_pieces):
+            moves.append(start | end << 6 | CAPTURE_BIT)
+        for end in iterateSquares(targets & ~enemy_pieces):
+            moves.append(start | end << 6)
 
+    @staticmethod
+    def addPawnMoves(start, end, flags, moves):
+        """
+        Add the pawn move, or the four promotions if it reaches the last row (queen first).
+        """
+        if end < 8 or end >= 56:
+            for promotion in (3, 2, 1, 0):  # queen, rook, bishop, knight
+                moves.append(start | end << 6 | (flags | PROMOTION | promotion) << 12)
+        else:
+            moves.append(start | end << 6 | flags << 12)
+
+    def getPawnMoves(self, square, moves, targets=FULL_BOARD):
+        """
+        Get all the pawn moves for the pawn on the square and add the moves to the list.
+        Only moves ending on a square of targets are added, en-passant if the captured pawn is on one.
+        """
+        pin_mask = self.getPinMask(square) & targets
+        bitboards = self.bitboards
         if self.white_to_move:
-            move_amount = -1
+            move_amount = -8
             start_row = 6
-            enemy_color = "b"
+            ally, enemy = WHITE, BLACK
             king_row, king_col = self.white_king_location
         else:
-            move_amount = 1
+            move_amount = 8
             start_row = 1
-            enemy_color = "w"
+            ally, enemy = BLACK, WHITE
             king_row, king_col = self.black_king_location
 
-        if self.board[row + move_amount][col] == "--":  # 1 square pawn advance
-            if not piece_pinned or pin_direction == (move_amount, 0):
-                moves.append(Move((row, col), (row + move_amount, col), self.board))
-                if row == start_row and self.board[row + 2 * move_amount][col] == "--":  # 2 square pawn advance
-                    moves.append(Move((row, col), (row + 2 * move_amount, col), self.board))
-        if col - 1 >= 0:  # capture to the left
-            if not piece_pinned or pin_direction == (move_amount, -1):
-                if self.board[row + move_amount][col - 1][0] == enemy_color:
-                    moves.append(Move((row, col), (row + move_amount, col - 1), self.board))
-                if (row + move_amount, col - 1) == self.enpassant_possible:
-                    attacking_piece = blocking_piece = False
-                    if king_row == row:
-                        if king_col < col:  # king is left of the pawn
-                            # inside: between king and the pawn;
-                            # outside: between pawn and border;
-                            inside_range = range(king_col + 1, col - 1)
-                            outside_range = range(col + 1, 8)
-                        else:  # king right of the pawn
-                            inside_range = range(king_col - 1, col, -1)
-                            outside_range = range(col - 2, -1, -1)
-                        for i in inside_range:
-                            if self.board[row][i] != "--":  # some piece beside en-passant pawn blocks
-                                blocking_piece = True
-                        for i in outside_range:
-                            square = self.board[row][i]
-                            if square[0] == enemy_color and (square[1] == "R" or square[1] == "Q"):
-                                attacking_piece = True
-                            elif square != "--":
-                                blocking_piece = True
-                    if not attacking_piece or blocking_piece:
-                        moves.append(Move((row, col), (row + move_amount, col - 1), self.board, is_enpassant_move=True))
-        if col + 1 <= 7:  # capture to the right
-            if not piece_pinned or pin_direction == (move_amount, +1):
-                if self.board[row + move_amount][col + 1][0] == enemy_color:
-                    moves.append(Move((row, col), (row + move_amount, col + 1), self.board))
-                if (row + move_amount, col + 1) == self.enpassant_possible:
-                    attacking_piece = blocking_piece = False
-                    if king_row == row:
-                        if king_col < col:  # king is left of the pawn
-                            # inside: between king and the pawn;
-                            # outside: between pawn and border;
-                            inside_range = range(king_col + 1, col)
-                            outside_range = range(col + 2, 8)
-                        else:  # king right of the pawn
-                            inside_range = range(king_col - 1, col + 1, -1)
-                            outside_range = range(col - 1, -1, -1)
-                        for i in inside_range:
-                            if self.board[row][i] != "--":  # some piece beside en-passant pawn blocks
-                                blocking_piece = True
-                        for i in outside_range:
-                            square = self.board[row][i]
-                            if square[0] == enemy_color and (square[1] == "R" or square[1] == "Q"):
-                                attacking_piece = True
-                            elif square != "--":
-                                blocking_piece = True
-                    if not attacking_piece or blocking_piece:
-                        moves.append(Move((row, col), (row + move_amount, col + 1), self.board, is_enpassant_move=True))
-
-    def getRookMoves(self, row, col, moves):
-        """
-        Get all the rook moves for the rook located at row, col and add the moves to the list.
-        """
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                if self.board[row][col][
-                    1] != "Q":  # can't remove queen from pin on rook moves, only remove it on bishop moves
-                    self.pins.remove(self.pins[i])
-                break
+        one_step = square + move_amount
+        if not bitboards.occupied & SQUARE_BITS[one_step]:  # 1 square pawn advance
+            if pin_mask & SQUARE_BITS[one_step]:
+                self.addPawnMoves(square, one_step, QUIET, moves)
+            if square >> 3 == start_row:  # 2 square pawn advance
+                two_steps = one_step + move_amount
+                if not bitboards.occupied & SQUARE_BITS[two_steps] and pin_mask & SQUARE_BITS[two_steps]:
+                    moves.append(square | two_steps << 6 | DOUBLE_PAWN_PUSH << 12)
+        for end in iterateSquares(PAWN_ATTACKS[ally][square] & pin_mask & bitboards.colors[enemy]):  # captures
+            self.addPawnMoves(square, end, CAPTURE, moves)
+        enpassant_square = self.enpassant_square
+        if enpassant_square:
+            captured_square = (square & 56) | (enpassant_square & 7)
+            if PAWN_ATTACKS[ally][square] & SQUARE_BITS[enpassant_square] and targets & SQUARE_BITS[captured_square]:
+                # both pawns leave the row, so the capture must not open a line from an enemy slider to the king
+                occupied = (bitboards.occupied ^ SQUARE_BITS[square] ^ SQUARE_BITS[captured_square]) | SQUARE_BITS[
+                    enpassant_square]
+                pieces = bitboards.pieces
+                enemy_piece = enemy * 6
+                king_square = king_row * 8 + king_col
+                if not (rookAttacks(king_square, occupied) & (pieces[enemy_piece + ROOK] | pieces[
+                        enemy_piece + QUEEN]) or bishopAttacks(king_square, occupied) & (
+                        pieces[enemy_piece + BISHOP] | pieces[enemy_piece + QUEEN])):
+                    moves.append(square | enpassant_square << 6 | ENPASSANT_CAPTURE << 12)
 
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1))  # up, left, down, right
-        enemy_color = "b" if self.white_to_move else "w"
-        for direction in directions:
-            for i in range(1, 8):
-                end_row = row + direction[0] * i
-                end_col = col + direction[1] * i
-                if 0 <= end_row <= 7 and 0 <= end_col <= 7:  # check for possible moves only in boundaries of the board
-                    if not piece_pinned or pin_direction == direction or pin_direction == (
-                            -direction[0], -direction[1]):
-                        end_piece = self.board[end_row][end_col]
-                        if end_piece == "--":  # empty space is valid
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                        elif end_piece[0] == enemy_color:  # capture enemy piece
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                            break
-                        else:  # friendly piece
-                            break
-                else:  # off board
-                    break
+    def getRookMoves(self, square, moves, targets=FULL_BOARD):
+        """
+        Get all the rook moves for the rook on the square and add the moves to the list.
+        """
+        bitboards = self.bitboards
+        ally = WHITE if self.white_to_move else BLACK
+        targets &= rookAttacks(square, bitboards.occupied) & ~bitboards.colors[ally] & self.getPinMask(square)
+        self.addMoves(square, targets, moves)
 
-    def getKnightMoves(self, row, col, moves):
+    def getKnightMoves(self, square, moves, targets=FULL_BOARD):
         """
-        Get all the knight moves for the knight located at row col and add the moves to the list.
+        Get all the knight moves for the knight on the square and add the moves to the list.
         """
-        piece_pinned = False
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                self.pins.remove(self.pins[i])
-                break
+        if self.getPinMask(square) != FULL_BOARD:  # a pinned knight can never stay on the pin line
+            return
+        ally = WHITE if self.white_to_move else BLACK
+        targets &= KNIGHT_ATTACKS[square] & ~self.bitboards.colors[ally]
+        self.addMoves(square, targets, moves)
 
-        knight_moves = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2),
-                        (1, -2))  # up/left up/right right/up right/down down/left down/right left/up left/down
-        ally_color = "w" if self.white_to_move else "b"
-        for move in knight_moves:
-            end_row = row + move[0]
-            end_col = col + move[1]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                if not piece_pinned:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece[0] != ally_color:  # so its either enemy piece or empty square
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
-
-    def getBishopMoves(self, row, col, moves):
-        """
-        Get all the bishop moves for the bishop located at row col and add the moves to the list.
-        """
-        piece_pinned = False
-        pin_direction = ()
-        for i in range(len(self.pins) - 1, -1, -1):
-            if self.pins[i][0] == row and self.pins[i][1] == col:
-                piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
-                break
+    def getBishopMoves(self, square, moves, targets=FULL_BOARD):
+        """
+        Get all the bishop moves for the bishop on the square and add the moves to the list.
+        """
+        bitboards = self.bitboards
+        ally = WHITE if self.white_to_move else BLACK
+        targets &= bishopAttacks(square, bitboards.occupied) & ~bitboards.colors[ally] & self.getPinMask(square)
+        self.addMoves(square, targets, moves)
 
-        directions = ((-1, -1), (-1, 1), (1, 1), (1, -1))  # diagonals: up/left up/right down/right down/left
-        enemy_color = "b" if self.white_to_move else "w"
-        for direction in directions:
-            for i in range(1, 8):
-                end_row = row + direction[0] * i
-                end_col = col + direction[1] * i
-                if 0 <= end_row <= 7 and 0 <= end_col <= 7:  # check if the move is on board
-                    if not piece_pinned or pin_direction == direction or pin_direction == (
-                            -direction[0], -direction[1]):
-                        end_piece = self.board[end_row][end_col]
-                        if end_piece == "--":  # empty space is valid
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                        elif end_piece[0] == enemy_color:  # capture enemy piece
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
-                            break
-                        else:  # friendly piece
-                            break
-                else:  # off board
-                    break
+    def getQueenMoves(self, square, moves, targets=FULL_BOARD):
+        """
+        Get all the queen moves for the queen on the square and add the moves to the list.
+        """
+        bitboards = self.bitboards
+        ally = WHITE if self.white_to_move else BLACK
+        targets &= queenAttacks(square, bitboards.occupied) & ~bitboards.colors[ally] & self.getPinMask(square)
+        self.addMoves(square, targets, moves)
 
-    def getQueenMoves(self, row, col, moves):
-        """
-        Get all the queen moves for the queen located at row col and add the moves to the list.
-        """
-        self.getBishopMoves(row, col, moves)
-        self.getRookMoves(row, col, moves)
-
-    def getKingMoves(self, row, col, moves):
-        """
-        Get all the king moves for the king located at row col and add the moves to the list.
-        """
-        row_moves = (-1, -1, -1, 0, 0, 1, 1, 1)
-        col_moves = (-1, 0, 1, -1, 1, -1, 0, 1)
-        ally_color = "w" if self.white_to_move else "b"
-        for i in range(8):
-            end_row = row + row_moves[i]
-            end_col = col + col_moves[i]
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally_color:  # not an ally piece - empty or enemy
-                    # place king on end square and check for checks
-                    if ally_color == "w":
-                        self.white_king_location = (end_row, end_col)
-                    else:
-                        self.black_king_location = (end_row, end_col)
-                    in_check, pins, checks = self.checkForPinsAndChecks()
-                    if not in_check:
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
-                    # place king back on original location
-                    if ally_color == "w":
-                        self.white_king_location = (row, col)
-                    else:
-                        self.black_king_location = (row, col)
+    def getKingMoves(self, square, moves, targets=FULL_BOARD):
+        """
+        Get all the king moves for the king on the square and add the moves to the list.
+        """
+        ally = WHITE if self.white_to_move else BLACK
+        targets &= KING_ATTACKS[square] & ~self.bitboards.colors[ally]
+        if targets:
+            self.addMoves(square, targets & ~self.kingDangerSquares(), moves)
 
     def getCastleMoves(self, row, col, moves):
         """
         Generate all valid castle moves for the king at (row, col) and add them to the list of moves.
+        The king's square and the squares it passes are looked up in the enemy attack map of the position.
         """
-        if self.squareUnderAttack(row, col):
+        enemy_attacks = self.attackedSquares(not self.white_to_move)
+        if enemy_attacks & SQUARE_BITS[row * 8 + col]:
             return  # can't castle while in check
-        if (self.white_to_move and self.current_castling_rights.wks) or (
-                not self.white_to_move and self.current_castling_rights.bks):
-            self.getKingsideCastleMoves(row, col, moves)
-        if (self.white_to_move and self.current_castling_rights.wqs) or (
-                not self.white_to_move and self.current_castling_rights.bqs):
-            self.getQueensideCastleMoves(row, col, moves)
-
-    def getKingsideCastleMoves(self, row, col, moves):
-        if self.board[row][col + 1] == '--' and self.board[row][col + 2] == '--':
-            if not self.squareUnderAttack(row, col + 1) and not self.squareUnderAttack(row, col + 2):
-                moves.append(Move((row, col), (row, col + 2), self.board, is_castle_move=True))
-
-    def getQueensideCastleMoves(self, row, col, moves):
-        if self.board[row][col - 1] == '--' and self.board[row][col - 2] == '--' and self.board[row][col - 3] == '--':
-            if not self.squareUnderAttack(row, col - 1) and not self.squareUnderAttack(row, col - 2):
-                moves.append(Move((row, col), (row, col - 2), self.board, is_castle_move=True))
+        if self.castling_rights & (WHITE_KINGSIDE if self.white_to_move else BLACK_KINGSIDE):
+            self.getKingsideCastleMoves(row, col, moves, enemy_attacks)
+        if self.castling_rights & (WHITE_QUEENSIDE if self.white_to_move else BLACK_QUEENSIDE):
+            self.getQueensideCastleMoves(row, col, moves, enemy_attacks)
 
+    def getKingsideCastleMoves(self, row, col, moves, enemy_attacks):
+        square = row * 8 + col
+        king_path = SQUARE_BITS[square + 1] | SQUARE_BITS[square + 2]
+        if not self.bitboards.occupied & king_path and not enemy_attacks & king_path:
+            moves.append(encodeMove(square, square + 2, KING_CASTLE))
 
-class CastleRights:
-    def __init__(self, wks, bks, wqs, bqs):
-        self.wks = wks
-        self.bks = bks
-        self.wqs = wqs
-        self.bqs = bqs
+    def getQueensideCastleMoves(self, row, col, moves, enemy_attacks):
+        square = row * 8 + col
+        king_path = SQUARE_BITS[square - 1] | SQUARE_BITS[square - 2]
+        if not self.bitboards.occupied & (king_path | SQUARE_BITS[square - 3]) and not enemy_attacks & king_path:
+            moves.append(encodeMove(square, square - 2, QUEEN_CASTLE))
 
 
 class Move:
@@ -632,7 +935,8 @@ class Move:
                      "e": 4, "f": 5, "g": 6, "h": 7}
     cols_to_files = {v: k for k, v in files_to_cols.items()}
 
-    def __init__(self, start_square, end_square, board, is_enpassant_move=False, is_castle_move=False):
+    def __init__(self, start_square, end_square, board, is_enpassant_move=False, is_castle_move=False,
+                 promotion="Q"):
         self.start_row = start_square[0]
         self.start_col = start_square[1]
         self.end_row = end_square[0]
@@ -642,6 +946,7 @@ class Move:
         # pawn promotion
         self.is_pawn_promotion = (self.piece_moved == "wp" and self.end_row == 0) or (
                 self.piece_moved == "bp" and self.end_row == 7)
+        self.promotion = promotion if self.is_pawn_promotion else None  # piece letter the pawn turns into
         # en passant
         self.is_enpassant_move = is_enpassant_move
         if self.is_enpassant_move:
@@ -651,6 +956,44 @@ class Move:
 
         self.is_capture = self.piece_captured != "--"
         self.moveID = self.start_row * 1000 + self.start_col * 100 + self.end_row * 10 + self.end_col
+        self.encoded = self.encode()
+
+    @classmethod
+    def fromEncoded(cls, move, piece_moved, piece_captured):
+        """
+        Move for a 16-bit move of the engine, given the piece moved and the piece captured ("--" if none).
+        """
+        move_object = cls.__new__(cls)
+        start, end, flags = move & 63, move >> 6 & 63, move >> 12
+        move_object.start_row, move_object.start_col = start >> 3, start & 7
+        move_object.end_row, move_object.end_col = end >> 3, end & 7
+        move_object.piece_moved = piece_moved
+        move_object.piece_captured = piece_captured
+        move_object.is_pawn_promotion = flags & PROMOTION != 0
+        move_object.promotion = PROMOTION_LETTERS[flags & 3] if move_object.is_pawn_promotion else None
+        move_object.is_enpassant_move = flags == ENPASSANT_CAPTURE
+        move_object.is_castle_move = flags == KING_CASTLE or flags == QUEEN_CASTLE
+        move_object.is_capture = piece_captured != "--"
+        move_object.moveID = move_object.start_row * 1000 + move_object.start_col * 100 + move_object.end_row * 10 + \
+            move_object.end_col
+        move_object.encoded = move
+        return move_object
+
+    def encode(self):
+        """
+        The move as the 16-bit integer the engine works with.
+        """
+        if self.is_castle_move:
+            flags = KING_CASTLE if self.end_col > self.start_col else QUEEN_CASTLE
+        elif self.is_enpassant_move:
+            flags = ENPASSANT_CAPTURE
+        else:
+            flags = CAPTURE if self.is_capture else QUIET
+            if self.is_pawn_promotion:
+                flags |= PROMOTION | PROMOTION_LETTERS.index(self.promotion)
+            elif self.piece_moved[1] == "p" and abs(self.end_row - self.start_row) == 2:
+                flags = DOUBLE_PAWN_PUSH
+        return encodeMove(self.start_row * 8 + self.start_col, self.end_row * 8 + self.end_col, flags)
 
     def __eq__(self, other):
         """
@@ -662,7 +1005,7 @@ class Move:
 
     def getChessNotation(self):
         if self.is_pawn_promotion:
-            return self.getRankFile(self.end_row, self.end_col) + "Q"
+            return self.getRankFile(self.end_row, self.end_col) + self.promotion
         if self.is_castle_move:
             if self.end_col == 1:
                 return "0-0-0"
@@ -698,7 +1041,7 @@ class Move:
             if self.is_capture:
                 return self.cols_to_files[self.start_col] + "x" + end_square
             else:
-                return end_square + "Q" if self.is_pawn_promotion else end_square
+                return end_square + self.promotion if self.is_pawn_promotion else end_square
 
         move_string = self.piece_moved[1]
         if self.is_capture:
@@ -6,8 +6,13 @@
 
 import pygame as p
 import ChessEngine
+import ChessAI
+import os
 import sys
 from multiprocessing import Process, Queue
+from TranspositionTable import TranspositionTable
+from OpeningBook import OpeningBook
+import Tablebase
 
 # Global constants
 
@@ -20,6 +25,8 @@ FEN_PANEL_HEIGHT = 20
 DIMENSION = 8
 SQUARE_SIZE = BOARD_HEIGHT // DIMENSION
 MAX_FPS = 15
+AI_TIME_LIMIT = 2  # seconds the computer player thinks about a move
+OPENING_BOOK_PATH = "books/book.bin"  # Polyglot book the computer player opens with, if the file is there
 IMAGES = {}
 
 '''
@@ -60,6 +67,11 @@ def main():
     ai_thinking = False
     move_undone = False
     move_finder_process = None
+    return_queue = None
+    # shared, so what the move finder processes learn is kept for the next moves
+    transposition_table = TranspositionTable(shared=True)
+    opening_book = OpeningBook(OPENING_BOOK_PATH) if os.path.exists(OPENING_BOOK_PATH) else None
+    Tablebase.loadKPK()  # built or read here, before the move finder processes start their timed searches
     move_log_font = p.font.SysFont("Arial", 14, False, False)
     player_one = True  # if a human is playing white, then this will be True, else False
     player_two = True  # if a human is playing white, then this will be True, else False
@@ -103,6 +115,7 @@ def main():
                             animate = True
                             square_selected = ()  # reset user clicks
                             player_clicks = []
+                            break  # the promotions share their squares, the first one is the queen
                     # If the player changes the piece to play
                     if not move_made:
                         player_clicks = [square_selected]
@@ -110,12 +123,20 @@ def main():
             # key handlers
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_z:  # undo when 'z' is pressed
+                    if ai_thinking:  # the move being searched is for a position that is gone
+                        move_finder_process.terminate()
+                        move_finder_process.join()
+                        ai_thinking = False
                     game_state.undoMove()
                     move_made = True
                     animate = False
                     game_over = False
                     move_undone = True
                 if e.key == p.K_r:  # reset the game when 'r' is pressed
+                    if ai_thinking:
+                        move_finder_process.terminate()
+                        move_finder_process.join()
+                        ai_thinking = False
                     game_state = ChessEngine.GameState()
                     valid_moves = game_state.getValidMoves()
                     square_selected = ()
@@ -123,7 +144,32 @@ def main():
                     move_made = False
                     animate = False
                     game_over = False
-                    move_undone = True
+                    move_undone = False  # the new game starts at once, also when the computer plays white
+
+        # AI move finder, searching in another process so that the window keeps responding
+        if not game_over and not human_turn and not move_undone:
+            if not ai_thinking:
+                ai_thinking = True
+                return_queue = Queue()  # used to pass the move found back to this process
+                move_finder_process = Process(target=findMoveWorker,
+                                              args=(game_state, transposition_table, opening_book, return_queue))
+                move_finder_process.start()
+
+            if not move_finder_process.is_alive():
+                move_finder_process.join()
+                ai_thinking = False
+                if move_finder_process.exitcode == 0:
+                    ai_move = return_queue.get()
+                    game_state.makeEncodedMove(ai_move)
+                    move_made = True
+                    animate = True
+                else:  # the search crashed, nothing will come on the queue: the human takes over its side
+                    print("The computer player stopped with exit code", move_finder_process.exitcode,
+                          file=sys.stderr)
+                    if game_state.white_to_move:
+                        player_one = True
+                    else:
+                        player_two = True
 
         # If a move was made, generate the valid moves for the new state of the board
         if move_made:
@@ -148,11 +194,30 @@ def main():
         elif game_state.stalemate:
             game_over = True
             drawEndGameText(screen, "Stalemate")
+        elif game_state.threefold_repetition:
+            game_over = True
+            drawEndGameText(screen, "Draw by threefold repetition")
+        elif game_state.fifty_move_rule:
+            game_over = True
+            drawEndGameText(screen, "Draw by the fifty-move rule")
+        elif game_state.insufficient_material:
+            game_over = True
+            drawEndGameText(screen, "Draw by insufficient material")
 
         clock.tick(MAX_FPS)
         p.display.flip()
 
 
+def findMoveWorker(game_state, transposition_table, opening_book, return_queue):
+    """
+    Runs in the move finder process: search the position and put the best move (a 16-bit move) on the queue.
+    """
+    Tablebase.loadKPK()  # from the cache file main made, if the process didn't start with it
+    result = ChessAI.findBestMove(game_state, time_limit=AI_TIME_LIMIT, transposition_table=transposition_table,
+                                  opening_book=opening_book)
+    return_queue.put(result.best_move)
+
+
 '''
 Graphics in the current GameState.
 '''
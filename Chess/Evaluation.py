@@ -0,0 +1,153 @@
+"""
+Static evaluation of a position: material plus piece-square tables.
+Every piece is worth its material value plus a bonus or penalty for the square it stands on. The sum is
+computed once by pieceSquareScore and kept up to date by the GameState as moves are made and undone, so
+evaluate is a lookup, and evaluateMoves scores the positions after a list of moves from the change each move
+makes to it, without making them.
+"""
+
+from Bitboard import PAWN, KNIGHT, ROOK, KING, WHITE_PAWN, BLACK_PAWN, iterateSquares
+from MoveEncoding import KING_CASTLE, QUEEN_CASTLE, ENPASSANT_CAPTURE, PROMOTION
+
+PIECE_VALUES = [100, 320, 330, 500, 900, 0]  # pawn, knight, bishop, rook, queen, king
+
+# bonuses for white pieces by square, a8 first like the board, black uses them mirrored
+PAWN_TABLE = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0]
+KNIGHT_TABLE = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50]
+BISHOP_TABLE = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20]
+ROOK_TABLE = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0]
+QUEEN_TABLE = [
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20]
+KING_TABLE = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20]
+PIECE_TABLES = [PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE, KING_TABLE]
+
+# PIECE_SQUARE_VALUES[piece][square]: material and square bonus of the piece code on the square from white's
+# point of view, so black pieces count negative. EMPTY has a row of zeros, any board can index the table.
+PIECE_SQUARE_VALUES = [[PIECE_VALUES[piece] + PIECE_TABLES[piece][square] for square in range(64)]
+                       for piece in range(6)]
+PIECE_SQUARE_VALUES += [[-PIECE_VALUES[piece] - PIECE_TABLES[piece][square ^ 56] for square in range(64)]
+                        for piece in range(6)]
+PIECE_SQUARE_VALUES.append([0] * 64)
+
+# moves a king on the square is away from the four centre squares
+CENTRE_DISTANCE = [max(3 - (square & 7), (square & 7) - 4) + max(3 - (square >> 3), (square >> 3) - 4)
+                   for square in range(64)]
+
+
+def evaluate(game_state):
+    """
+    Score of the position in centipawns from the point of view of the side to move.
+    The GameState keeps the score up to date while moves are made and undone, so this is a lookup.
+    """
+    return game_state.piece_square_score if game_state.white_to_move else -game_state.piece_square_score
+
+
+def mopUpScore(winning_king, losing_king):
+    """
+    Bonus for the winning side of an endgame for driving the losing king, both kings given as squares, to the edge
+    and bringing its own king close to it, which a lone king has to be for checkmate.
+    """
+    king_distance = abs((winning_king & 7) - (losing_king & 7)) + abs((winning_king >> 3) - (losing_king >> 3))
+    return 10 * CENTRE_DISTANCE[losing_king] + 4 * (14 - king_distance)
+
+
+def pieceSquareScore(bitboards):
+    """
+    Material and square bonuses of all the pieces from white's point of view, added up from scratch.
+    """
+    pieces = bitboards.pieces
+    score = 0
+    for piece in range(12):
+        values = PIECE_SQUARE_VALUES[piece]
+        for square in iterateSquares(pieces[piece]):
+            score += values[square]
+    return score
+
+
+def evaluateMoves(game_state, moves):
+    """
+    Scores of the positions the 16-bit moves lead to, from the point of view of the side making them, as a list.
+    Nothing is made on the board: a move only changes the values of the squares it touches, so each score is the
+    score of the position plus the change of its move. For the few dozen moves of a position this is faster in
+    plain Python than building NumPy arrays for them.
+    """
+    squares = game_state.bitboards.squares
+    white = game_state.white_to_move
+    score = game_state.piece_square_score  # white's point of view
+    scores = []
+    for move in moves:
+        start = move & 63
+        end = move >> 6 & 63
+        flags = move >> 12
+        piece = squares[start]
+        # a promotion lands the new piece: knight, bishop, rook or queen of the pawn's color
+        landed = piece - PAWN + KNIGHT + (flags & 3) if flags & PROMOTION else piece
+        change = (PIECE_SQUARE_VALUES[landed][end] - PIECE_SQUARE_VALUES[piece][start]
+                  - PIECE_SQUARE_VALUES[squares[end]][end])
+        if flags == ENPASSANT_CAPTURE or flags == KING_CASTLE or flags == QUEEN_CASTLE:
+            change += specialMoveChange(move, squares, white)
+        scores.append(score + change if white else -score - change)
+    return scores
+
+
+def specialMoveChange(move, squares, white):
+    """
+    Change of white's score from the piece an en-passant capture or castling moves besides the moving one.
+    """
+    start = move & 63
+    end = move >> 6 & 63
+    flags = move >> 12
+    if flags == ENPASSANT_CAPTURE:
+        captured = BLACK_PAWN if white else WHITE_PAWN
+        return -PIECE_SQUARE_VALUES[captured][(start & 56) | (end & 7)]
+    rook = squares[start] - KING + ROOK
+    if flags == KING_CASTLE:
+        return PIECE_SQUARE_VALUES[rook][end - 1] - PIECE_SQUARE_VALUES[rook][end + 1]
+    return PIECE_SQUARE_VALUES[rook][end + 1] - PIECE_SQUARE_VALUES[rook][end - 2]
@@ -0,0 +1,23 @@
+"""
+Moves packed into 16-bit integers for move generation and search.
+Bits 0-5 hold the start square, bits 6-11 the end square and bits 12-15 the flags below.
+Bit 2 of the flags is set for every capture and bit 3 for every promotion, the lowest two bits of a
+promotion tell the piece: knight, bishop, rook or queen.
+"""
+
+QUIET = 0
+DOUBLE_PAWN_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+CAPTURE = 4
+ENPASSANT_CAPTURE = 5
+PROMOTION = 8
+
+CAPTURE_BIT = CAPTURE << 12
+PROMOTION_BIT = PROMOTION << 12
+NO_MOVE = 0  # a move can't start and end on a8, so 0 is never a real move
+
+
+def encodeMove(start_square, end_square, flags=QUIET):
+    return start_square | end_square << 6 | flags << 12
+
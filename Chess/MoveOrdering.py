@@ -0,0 +1,95 @@
+"""
+Ordering moves so that alpha-beta searches the best ones first.
+Order: the move stored in the transposition table, captures by MVV-LVA (most valuable victim, least
+valuable attacker), promotions, the killer moves of the ply and finally the other quiet moves by their
+history score. Moves can be handed out lazily: after a cutoff the remaining moves are never sorted.
+"""
+
+from MoveEncoding import CAPTURE_BIT, PROMOTION_BIT, ENPASSANT_CAPTURE
+
+CAPTURE_SCORE = 100000
+PROMOTION_SCORE = 90000
+KILLER_SCORES = (80000, 79000)
+HISTORY_LIMIT = 50000  # history scores are halved once one of them passes this, so they stay below the killers
+MAX_PLY = 128
+
+# MVV_LVA[victim][attacker]: a pawn taking a queen first, a king taking a pawn last among the captures
+MVV_LVA = [[victim * 10 + 5 - attacker for attacker in range(6)] for victim in range(6)]
+
+
+class MoveOrdering:
+    def __init__(self):
+        """
+        killers has the two latest quiet moves that caused a cutoff at every ply.
+        history[color][from][to] grows every time a quiet move causes a cutoff, more for deeper cutoffs.
+        """
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [[[0] * 64 for _ in range(64)] for _ in range(2)]
+
+    def scoreMove(self, move, ply, squares, color):
+        """
+        Score of the 16-bit move, squares are the pieces of the board by square and color the side to move.
+        """
+        if move & CAPTURE_BIT:
+            # en-passant captures a pawn, the square the pawn moves to is empty
+            victim = 0 if move >> 12 == ENPASSANT_CAPTURE else squares[move >> 6 & 63] % 6
+            score = CAPTURE_SCORE + MVV_LVA[victim][squares[move & 63] % 6]
+            if move & PROMOTION_BIT:
+                score += PROMOTION_SCORE + (move >> 12 & 3)
+            return score
+        if move & PROMOTION_BIT:
+            return PROMOTION_SCORE + (move >> 12 & 3)  # the queen before the under-promotions
+        killers = self.killers[ply]
+        if move == killers[0]:
+            return KILLER_SCORES[0]
+        if move == killers[1]:
+            return KILLER_SCORES[1]
+        return self.history[color][move & 63][move >> 6 & 63]
+
+    def orderedMoves(self, game_state, hash_move=0, ply=0):
+        """
+        Yield the valid moves of the game_state best first, doing only as much work as the moves taken so far need.
+        The hash move is checked and yielded before anything is generated. The captures are generated next and
+        handed out best first, the quiet moves are only generated after all captures have been searched.
+        """
+        first_move = hash_move if hash_move and game_state.isValidMove(hash_move) else 0
+        if first_move:
+            yield first_move
+        squares = game_state.bitboards.squares
+        color = 0 if game_state.white_to_move else 1
+        yield from self.pickMoves(game_state.generateCaptures(), first_move, ply, squares, color)
+        yield from self.pickMoves(game_state.generateQuiets(), first_move, ply, squares, color)
+
+    def pickMoves(self, moves, skipped_move, ply, squares, color):
+        """
+        Yield the moves (except skipped_move) best first, each call picks the best remaining move.
+        The scores are taken before the first move is yielded, while squares still holds the position.
+        """
+        if skipped_move and skipped_move in moves:
+            moves.remove(skipped_move)
+        scores = [self.scoreMove(move, ply, squares, color) for move in moves]
+        while moves:
+            best = max(range(len(scores)), key=scores.__getitem__)
+            scores[best] = scores[-1]
+            scores.pop()
+            moves[best], moves[-1] = moves[-1], moves[best]
+            yield moves.pop()
+
+    def updateCutoff(self, move, depth, ply, color):
+        """
+        Remember a quiet move of the color that caused a beta cutoff as a killer of the ply and in the history table.
+        """
+        if move & (CAPTURE_BIT | PROMOTION_BIT):
+            return
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        to_scores = self.history[color][move & 63]
+        to_scores[move >> 6 & 63] += depth * depth
+        if to_scores[move >> 6 & 63] > HISTORY_LIMIT:
+            for color in range(2):
+                for from_square in range(64):
+                    scores = self.history[color][from_square]
+                    for to_square in range(64):
+                        scores[to_square] //= 2
@@ -0,0 +1,89 @@
+"""
+Searching on several CPU cores with Lazy SMP.
+Every process runs its own iterative deepening search of the same position, they only share the
+transposition table (in shared memory). The helpers fill the table with results the main search
+then finds instead of searching them again; half of them start one depth deeper so that they
+don't all search the same tree in the same order.
+"""
+
+import multiprocessing
+import queue
+import time
+
+import Tablebase
+from ChessAI import Search, SearchResult, SearchLimits, MAX_DEPTH
+from TranspositionTable import TranspositionTable
+
+HELPER_STOP_TIMEOUT = 1.0  # seconds a helper may take to report after the stop, one that doesn't is left out
+
+
+def searchWorker(game_state, transposition_table, stop_event, results, max_depth, start_depth):
+    """
+    Helper process: search until the stop_event is set or max_depth is done and put the result on the results queue.
+    """
+    Tablebase.loadKPK()  # a spawned process starts without it, the main search has it
+    limits = SearchLimits(depth=max_depth)
+    search = Search(game_state, transposition_table, stop_event)
+    result = search.iterativeDeepening(limits, start_depth, new_generation=False)
+    results.put((result.best_move, result.score, result.depth, result.nodes))
+
+
+def findBestMoveParallel(game_state, processes=None, max_depth=MAX_DEPTH, time_limit=None, transposition_table=None,
+                         limits=None):
+    """
+    findBestMove on processes cores (all of them by default), returns a SearchResult.
+    The helpers search without limits of their own, they stop when the main search is done.
+    The move of the deepest completed search is played, the main search wins ties. nodes counts all processes.
+    A helper that crashed or doesn't report in time is left out, so that it can't hang the search.
+    transposition_table must be a shared TranspositionTable to be kept between moves, a new shared one
+    is made if it is None or not shared.
+    """
+    if limits is None:
+        limits = SearchLimits(depth=max_depth if max_depth != MAX_DEPTH else None, move_time=time_limit)
+    if not limits.isBounded():
+        raise ValueError("findBestMoveParallel needs a depth, node or time limit")
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if transposition_table is None or not transposition_table.shared:
+        size_mb = transposition_table.size_mb if transposition_table is not None else 16
+        transposition_table = TranspositionTable(size_mb, shared=True)
+    return searchParallel(Search(game_state, transposition_table), limits, processes)
+
+
+def searchParallel(search, limits, processes, report=None):
+    """
+    search.iterativeDeepening(limits, report=report) with processes - 1 helper processes, returns a SearchResult
+    like findBestMoveParallel. The transposition table of the search must be shared.
+    """
+    start_time = time.time()
+    game_state = search.game_state
+    transposition_table = search.transposition_table
+    max_depth = limits.depth if limits.depth is not None else MAX_DEPTH
+    transposition_table.newGeneration()  # one generation for the main search and all helpers
+    stop_event = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    helpers = []
+    for helper in range(processes - 1):
+        start_depth = 2 if helper % 2 == 0 else 1
+        process = multiprocessing.Process(target=searchWorker, args=(
+            game_state, transposition_table, stop_event, results, max_depth, start_depth), daemon=True)
+        process.start()
+        helpers.append(process)
+
+    best = search.iterativeDeepening(limits, report=report, new_generation=False)
+    stop_event.set()
+    nodes = best.nodes
+    for _ in helpers:
+        try:
+            best_move, score, depth, helper_nodes = results.get(timeout=HELPER_STOP_TIMEOUT)
+        except queue.Empty:
+            break
+        nodes += helper_nodes
+        if depth > best.depth and best_move is not None:
+            best = SearchResult(best_move, score, depth, 0, 0)
+    for process in helpers:
+        process.join(HELPER_STOP_TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    return SearchResult(best.best_move, best.score, best.depth, nodes, time.time() - start_time)
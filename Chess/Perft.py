@@ -0,0 +1,135 @@
+"""
+Perft: counting the leaf nodes of the move generation tree to a fixed depth.
+The counts of the standard test positions are known, so a wrong count means a bug in move generation,
+make or undo. Run from the Chess directory, the nodes per second give a throughput number to compare
+changes of the engine against:
+    python Perft.py                 whole suite to the default depths
+    python Perft.py --depth 5       whole suite, up to depth 5 where the count is known
+    python Perft.py --divide 3 --fen "<FEN>"    node count below every move of the position
+"""
+
+import argparse
+import time
+
+import ChessEngine
+from ChessEngine import START_FEN
+
+# name, FEN, known node counts by depth
+PERFT_SUITE = [
+    ("start position", START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ("rook endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("promotions and castling", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("promotion with check", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+    ("en-passant exposing the king", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+     {1: 18, 2: 92, 3: 1670, 4: 10138, 5: 185429}),
+    ("en-passant along a diagonal", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1",
+     {1: 13, 2: 102, 3: 1266, 4: 10276, 5: 135655}),
+    ("en-passant giving check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+     {1: 15, 2: 126, 3: 1928, 4: 13931, 5: 206379}),
+    ("castling through attacks", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1",
+     {1: 44, 2: 1494, 3: 50509, 4: 1720476}),
+    ("promotion out of check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1",
+     {1: 11, 2: 133, 3: 1442, 4: 19174}),
+    ("promotion giving check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1",
+     {1: 9, 2: 40, 3: 472, 4: 2661, 5: 38983}),
+    ("under-promotion giving check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1",
+     {1: 6, 2: 27, 3: 273, 4: 1329, 5: 18135}),
+    ("self stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1",
+     {1: 2, 2: 6, 3: 13, 4: 63, 5: 382}),
+    ("stalemate and checkmate", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1",
+     {1: 10, 2: 25, 3: 268, 4: 926, 5: 10857}),
+]
+
+DEFAULT_NODE_LIMIT = 250000  # the default run skips the depths with more nodes than this
+
+
+def perft(game_state, depth):
+    """
+    Number of move sequences of depth moves from the position, the last ply is counted without making the moves.
+    """
+    moves = list(game_state.generateMoves())
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        game_state.makeEncodedMove(move)
+        nodes += perft(game_state, depth - 1)
+        game_state.undoMove()
+    return nodes
+
+
+def divide(game_state, depth):
+    """
+    Perft split by the first move: a list of (16-bit move, nodes), handy for finding the move a wrong count comes from.
+    """
+    results = []
+    for move in list(game_state.generateMoves()):
+        game_state.makeEncodedMove(move)
+        results.append((move, perft(game_state, depth - 1)))
+        game_state.undoMove()
+    return results
+
+
+def runSuite(max_depth=None, node_limit=DEFAULT_NODE_LIMIT):
+    """
+    Check the counts of the suite up to max_depth (or up to node_limit nodes if max_depth is None) and print them.
+    Returns True if every count matched.
+    """
+    game_state = ChessEngine.GameState()
+    all_passed = True
+    total_nodes = 0
+    total_time = 0
+    for name, FEN, counts in PERFT_SUITE:
+        for depth in sorted(counts):
+            if max_depth is not None and depth > max_depth:
+                break
+            if max_depth is None and counts[depth] > node_limit:
+                break
+            game_state.FEN_to_board(FEN)
+            start_time = time.time()
+            nodes = perft(game_state, depth)
+            elapsed = time.time() - start_time
+            total_nodes += nodes
+            total_time += elapsed
+            passed = nodes == counts[depth]
+            all_passed = all_passed and passed
+            print("{:<30} depth {} {:>9} nodes {:>8.2f}s {:>8.0f} nps  {}".format(
+                name, depth, nodes, elapsed, nodes / max(elapsed, 1e-9),
+                "ok" if passed else "FAILED, expected " + str(counts[depth])))
+    print("total {} nodes in {:.2f}s, {:.0f} nps, {}".format(total_nodes, total_time,
+                                                             total_nodes / max(total_time, 1e-9),
+                                                             "all passed" if all_passed else "FAILED"))
+    return all_passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft correctness suite and move generation benchmark.")
+    parser.add_argument("--depth", type=int, help="search every position of the suite up to this depth")
+    parser.add_argument("--divide", type=int, metavar="DEPTH", help="print the node count below every move")
+    parser.add_argument("--fen", default=START_FEN, help="position for --divide, the start position by default")
+    args = parser.parse_args()
+    if args.divide is not None:
+        game_state = ChessEngine.GameState()
+        game_state.FEN_to_board(args.fen)
+        start_time = time.time()
+        results = divide(game_state, args.divide)
+        elapsed = time.time() - start_time
+        for move, nodes in results:
+            print(ChessEngine.GameState.moveToUCI(move) + ":", nodes)
+        nodes = sum(nodes for move, nodes in results)
+        print("total {} nodes in {:.2f}s, {:.0f} nps".format(nodes, elapsed, nodes / max(elapsed, 1e-9)))
+        return
+    if not runSuite(args.depth):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
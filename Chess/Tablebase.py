@@ -0,0 +1,217 @@
+"""
+Endgame tablebase: exact results of positions with few pieces, so the search doesn't have to find them.
+King and pawn against king (KPK) is solved here by retrograde analysis into a bitbase of won positions. Building
+it takes a second or two, too long for a timed search, so the front-ends call loadKPK before they search; it is
+read from a cache file after the first build. Until it is loaded KPK positions have no result. King and rook or
+queen against king (KRK, KQK) are won unless the lone king takes the piece or is stalemated at once, and a king
+with at most one knight or bishop against a king can't win.
+Syzygy tablebases on the local disk can be added with openSyzygy, they are read with python-chess, which is
+optional: without it only the positions above have results.
+"""
+
+import os
+
+try:
+    import chess
+    import chess.syzygy
+except ImportError:
+    chess = None
+
+from Bitboard import PAWN, KNIGHT, BISHOP, ROOK, KING, WHITE_PAWN, WHITE_KING, BLACK_KING, \
+    iterateSquares, lowestSquare, popCount
+from AttackTables import KING_ATTACKS, PAWN_ATTACKS, rookAttacks, queenAttacks
+
+WIN, DRAW, LOSS = 1, 0, -1  # results for the side to move
+BUILT_IN_PIECES = 3  # the positions solved here have at most this many pieces, kings included
+
+# KPK positions by white king, black king, white pawn (files a-d, rows 1-6) and side to move, black pawns and
+# pawns on files e-h are mirrored onto these
+KPK_SIZE = 24 * 64 * 64 * 2
+INVALID, UNKNOWN, KPK_DRAW, KPK_WIN = 0, 1, 2, 4  # bit flags, so the results of the moves can be OR-ed together
+KING_TARGETS = [list(iterateSquares(KING_ATTACKS[square])) for square in range(64)]
+
+KPK_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kpk.bin")
+
+_kpk_bitbase = None  # set by loadKPK
+_syzygy = None  # python-chess Syzygy tablebase opened by openSyzygy
+_syzygy_pieces = 0  # pieces of its largest table
+
+
+def kpkIndex(black_to_move, white_king, black_king, pawn):
+    return ((((pawn >> 3) - 1) * 4 + (pawn & 7)) * 4096 + white_king * 64 + black_king) * 2 + black_to_move
+
+
+def buildKPK():
+    """
+    The KPK bitbase as a bytearray of KPK_WIN or KPK_DRAW for white by kpkIndex.
+    Positions decided on the spot are marked first: the pawn promotes safely, or the black king is stalemated
+    or takes the pawn. Then the others are decided from the results of their moves until nothing changes: white
+    wins if one move wins, black draws if one move draws. Whatever is still unknown at the end is a draw.
+    """
+    results = bytearray(KPK_SIZE)
+    successors = {}
+    for pawn_index in range(24):
+        pawn = ((pawn_index >> 2) + 1) * 8 + (pawn_index & 3)
+        pawn_attacks = PAWN_ATTACKS[0][pawn]
+        for white_king in range(64):
+            for black_king in range(64):
+                if white_king == black_king or white_king == pawn or black_king == pawn \
+                        or KING_ATTACKS[white_king] >> black_king & 1:
+                    continue
+                # white to move
+                index = kpkIndex(0, white_king, black_king, pawn)
+                promotion = pawn - 8
+                if pawn_attacks >> black_king & 1:
+                    pass  # black is in check with white to move
+                elif pawn >> 3 == 1 and white_king != promotion and black_king != promotion and (
+                        not KING_ATTACKS[black_king] >> promotion & 1 or KING_ATTACKS[white_king] >> promotion & 1):
+                    results[index] = KPK_WIN
+                else:
+                    results[index] = UNKNOWN
+                    moves = [kpkIndex(1, square, black_king, pawn) for square in KING_TARGETS[white_king]]
+                    if pawn >> 3 > 1:
+                        moves.append(kpkIndex(1, white_king, black_king, promotion))
+                        if pawn >> 3 == 6 and white_king != promotion and black_king != promotion:
+                            moves.append(kpkIndex(1, white_king, black_king, pawn - 16))
+                    successors[index] = moves
+                # black to move
+                index = kpkIndex(1, white_king, black_king, pawn)
+                safe = KING_ATTACKS[black_king] & ~(KING_ATTACKS[white_king] | pawn_attacks)
+                if safe == 0 or (safe >> pawn & 1):
+                    results[index] = KPK_DRAW
+                else:
+                    results[index] = UNKNOWN
+                    successors[index] = [kpkIndex(0, white_king, square, pawn) for square in KING_TARGETS[black_king]]
+
+    changed = True
+    while changed:
+        changed = False
+        for index, moves in list(successors.items()):
+            reachable = 0
+            for move in moves:
+                reachable |= results[move]
+            good, bad = (KPK_WIN, KPK_DRAW) if index & 1 == 0 else (KPK_DRAW, KPK_WIN)
+            if reachable & good:
+                results[index] = good
+            elif not reachable & UNKNOWN:
+                results[index] = bad
+            else:
+                continue
+            del successors[index]
+            changed = True
+    for index in successors:
+        results[index] = KPK_DRAW
+    return results
+
+
+def loadKPK(path=KPK_CACHE_PATH):
+    """
+    Make the KPK bitbase available to probe: read it from the file at path, or build it and try to save it there.
+    Does nothing if it is already loaded.
+    """
+    global _kpk_bitbase
+    if _kpk_bitbase is not None:
+        return
+    try:
+        with open(path, "rb") as file:
+            bitbase = bytearray(file.read())
+        if len(bitbase) == KPK_SIZE:
+            _kpk_bitbase = bitbase
+            return
+    except OSError:
+        pass
+    _kpk_bitbase = buildKPK()
+    try:
+        with open(path, "wb") as file:
+            file.write(_kpk_bitbase)
+    except OSError:
+        pass  # a read-only install builds it in every process
+
+
+def probeKPK(game_state, pawn_piece):
+    if _kpk_bitbase is None:
+        return None
+    pieces = game_state.bitboards.pieces
+    pawn = lowestSquare(pieces[pawn_piece])
+    if pawn >> 3 == 0 or pawn >> 3 == 7:
+        return None
+    strong_king = lowestSquare(pieces[WHITE_KING if pawn_piece == WHITE_PAWN else BLACK_KING])
+    weak_king = lowestSquare(pieces[BLACK_KING if pawn_piece == WHITE_PAWN else WHITE_KING])
+    strong_to_move = game_state.white_to_move == (pawn_piece == WHITE_PAWN)
+    flip = 0 if pawn_piece == WHITE_PAWN else 56  # a black pawn is seen from black's side
+    if pawn & 7 > 3:
+        flip ^= 7  # and files e-h mirrored onto a-d
+    result = _kpk_bitbase[kpkIndex(not strong_to_move, strong_king ^ flip, weak_king ^ flip, pawn ^ flip)]
+    if result == INVALID:
+        return None
+    if result == KPK_DRAW:
+        return DRAW
+    return WIN if strong_to_move else LOSS
+
+
+def probeMajorPiece(game_state, piece):
+    """
+    KRK and KQK: won for the side with the rook or queen unless the lone king is to move and stalemated or takes
+    the piece. None if the lone king is checkmated, the search scores that itself.
+    """
+    pieces = game_state.bitboards.pieces
+    strong_white = piece < 6
+    strong_to_move = game_state.white_to_move == strong_white
+    if strong_to_move:
+        return WIN
+    piece_square = lowestSquare(pieces[piece])
+    strong_king = lowestSquare(pieces[WHITE_KING if strong_white else BLACK_KING])
+    weak_king = lowestSquare(pieces[BLACK_KING if strong_white else WHITE_KING])
+    occupied = game_state.bitboards.occupied ^ (1 << weak_king)  # the lone king doesn't block the piece
+    piece_attacks = rookAttacks(piece_square, occupied) if piece % 6 == ROOK else queenAttacks(piece_square, occupied)
+    guarded = KING_ATTACKS[strong_king] | piece_attacks
+    if (KING_ATTACKS[weak_king] & ~KING_ATTACKS[strong_king]) >> piece_square & 1:
+        return DRAW  # the piece is taken
+    if KING_ATTACKS[weak_king] & ~guarded & ~(1 << piece_square):
+        return LOSS
+    return None if piece_attacks >> weak_king & 1 else DRAW  # checkmate or stalemate
+
+
+def openSyzygy(path):
+    """
+    Probe the Syzygy tablebase files in the directory path as well. Needs python-chess.
+    """
+    global _syzygy, _syzygy_pieces
+    if chess is None:
+        raise ImportError("Syzygy tablebases need python-chess")
+    _syzygy = chess.syzygy.open_tablebase(path)
+    _syzygy_pieces = max((len(name) - 1 for name in _syzygy.wdl), default=0)  # tables are named like KRPvKR
+
+
+def maxPieces():
+    """
+    Most pieces, kings included, a position can have to get a result from probe.
+    """
+    return max(BUILT_IN_PIECES, _syzygy_pieces)
+
+
+def probe(game_state):
+    """
+    WIN, DRAW or LOSS for the side to move in the position of the game_state if it is in the tablebase, else None.
+    Results are exact under best play, but ignore the fifty-move rule and repetitions.
+    """
+    bitboards = game_state.bitboards
+    piece_count = popCount(bitboards.occupied)
+    if piece_count <= BUILT_IN_PIECES:
+        pieces = bitboards.pieces
+        if piece_count == 2:
+            return DRAW
+        for piece in range(12):
+            if piece % 6 == KING or not pieces[piece]:
+                continue
+            if piece % 6 == PAWN:
+                return probeKPK(game_state, piece)
+            if piece % 6 == KNIGHT or piece % 6 == BISHOP:
+                return DRAW
+            return probeMajorPiece(game_state, piece)
+    if _syzygy is not None and piece_count <= _syzygy_pieces and game_state.castling_rights == 0:
+        wdl = _syzygy.get_wdl(chess.Board(game_state.board_to_FEN()))
+        if wdl is not None:
+            # a win that takes more than fifty moves (1 or -1) is a draw
+            return WIN if wdl == 2 else LOSS if wdl == -2 else DRAW
+    return None
@@ -0,0 +1,127 @@
+"""
+Fixed-size transposition table keyed by the Zobrist key of a position.
+Every entry stores the depth searched, the kind of bound the score is, the score and the best move.
+The table is a pair of flat arrays of 64-bit integers (a checked key and a packed entry per slot), so its
+memory use is fixed when it is created and does not grow during the game.
+Slots come in buckets of two: the first keeps the deepest search seen for the bucket, the second always
+takes the newest entry, so deep results survive while recent positions are still remembered. Every entry
+records the generation (the search) that stored it, and a deep entry of an earlier search gives up the first
+slot to any entry of the current one, so a table kept for a whole game doesn't fill up with old results.
+A shared table lives in shared memory, so search processes started with it all read and write the same
+entries. They write without locks: a slot holds the key XOR the entry, so a slot whose key and entry were
+written by two different processes at the same time no longer matches any key and is ignored.
+"""
+
+from array import array
+from multiprocessing import RawArray
+
+# bound types, 0 marks an empty slot
+EXACT, LOWER_BOUND, UPPER_BOUND = 1, 2, 3
+
+BYTES_PER_SLOT = 16  # 8 byte key + 8 byte packed entry
+SLOTS_PER_BUCKET = 2
+SCORE_OFFSET = 1 << 19  # scores are stored shifted into a 20-bit unsigned field
+GENERATIONS = 256  # generations are counted in an 8-bit field, so they wrap around
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16, shared=False):
+        self.size_mb = size_mb
+        self.shared = shared
+        self.bucket_mask = 0
+        self.keys = array("Q")
+        self.entries = array("Q")
+        self.shared_keys = None
+        self.shared_entries = None
+        # generation of the current search in a one byte array, shared memory for a shared table so that all the
+        # processes using it agree
+        self.generation = RawArray("B", 1) if shared else bytearray(1)
+        self.resize(size_mb)
+
+    def __getstate__(self):
+        """
+        The views of a shared table can't be pickled, a process it is handed to makes them again from the arrays.
+        """
+        state = self.__dict__.copy()
+        if self.shared:
+            del state["keys"], state["entries"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.shared:
+            self.keys = memoryview(self.shared_keys).cast("B").cast("Q")
+            self.entries = memoryview(self.shared_entries).cast("B").cast("Q")
+
+    def resize(self, size_mb):
+        """
+        Use size_mb megabytes, rounded down to a power of two buckets. All stored entries are lost.
+        """
+        buckets = 1
+        while buckets * 2 * SLOTS_PER_BUCKET * BYTES_PER_SLOT <= size_mb * 1024 * 1024:
+            buckets *= 2
+        self.size_mb = size_mb
+        self.bucket_mask = buckets - 1
+        if self.shared:
+            self.shared_keys = RawArray("Q", buckets * SLOTS_PER_BUCKET)
+            self.shared_entries = RawArray("Q", buckets * SLOTS_PER_BUCKET)
+            self.keys = memoryview(self.shared_keys).cast("B").cast("Q")
+            self.entries = memoryview(self.shared_entries).cast("B").cast("Q")
+        else:
+            self.keys = array("Q", bytes(8 * buckets * SLOTS_PER_BUCKET))
+            self.entries = array("Q", bytes(8 * buckets * SLOTS_PER_BUCKET))
+
+    def clear(self):
+        """
+        Forget every entry, a shared table keeps its memory so the processes using it see the empty table.
+        """
+        if self.shared:
+            for index in range(len(self.keys)):
+                self.keys[index] = 0
+                self.entries[index] = 0
+        else:
+            self.resize(self.size_mb)
+
+    def newGeneration(self):
+        """
+        Start the generation of a new search, the entries stored so far become replaceable by its entries.
+        """
+        self.generation[0] = (self.generation[0] + 1) % GENERATIONS
+
+    def probe(self, key):
+        """
+        (depth, bound, score, move) stored for the position, or None if it isn't in the table.
+        """
+        slot = (key & self.bucket_mask) * SLOTS_PER_BUCKET
+        keys = self.keys
+        entries = self.entries
+        entry = entries[slot]
+        if keys[slot] ^ entry != key:
+            entry = entries[slot + 1]
+            if keys[slot + 1] ^ entry != key:
+                return None
+        if entry == 0:
+            return None
+        return entry >> 36 & 0xFF, entry >> 44 & 3, (entry >> 16 & 0xFFFFF) - SCORE_OFFSET, entry & 0xFFFF
+
+    def store(self, key, depth, bound, score, move):
+        """
+        Store a search result. move is a 16-bit move number, 0 if there is no best move.
+        The first slot of the bucket takes it if it is at least as deep as the entry there or that entry is from
+        an earlier generation.
+        """
+        generation = self.generation[0]
+        entry = move | (score + SCORE_OFFSET) << 16 | depth << 36 | bound << 44 | generation << 46
+        slot = (key & self.bucket_mask) * SLOTS_PER_BUCKET
+        keys = self.keys
+        entries = self.entries
+        same_key = keys[slot] ^ entries[slot] == key
+        if same_key or depth >= entries[slot] >> 36 & 0xFF or entries[slot] >> 46 != generation:
+            if not same_key and entries[slot] != 0:  # the older deep entry moves to the always-replace slot
+                keys[slot + 1] = keys[slot]
+                entries[slot + 1] = entries[slot]
+            keys[slot] = key ^ entry
+            entries[slot] = entry
+        else:
+            keys[slot + 1] = key ^ entry
+            entries[slot + 1] = entry
@@ -0,0 +1,220 @@
+"""
+UCI (Universal Chess Interface) front-end, so that chess GUIs and tournament managers can run the engine.
+Commands come in on standard input and the answers go out on standard output. The search runs on a
+background thread and polls a stop event, so stop, isready and quit are answered while it thinks.
+Run from the Chess directory:
+    python UCI.py
+"""
+
+import multiprocessing
+import sys
+import threading
+
+import ChessEngine
+import Tablebase
+from ChessAI import Search, SearchLimits, CHECKMATE, MATE_THRESHOLD
+from ChessEngine import START_FEN
+from ParallelSearch import searchParallel
+from TranspositionTable import TranspositionTable
+
+ENGINE_NAME = "SigmaZero"
+ENGINE_AUTHOR = "BerkeAltiparmak"
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 4096
+MAX_THREADS = multiprocessing.cpu_count()
+GO_TIMES = {"movetime", "wtime", "btime", "winc", "binc"}  # go parameters in milliseconds
+GO_COUNTS = {"depth", "nodes", "movestogo"}
+
+
+class UCIEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.game_state = ChessEngine.GameState()
+        self.transposition_table = TranspositionTable(DEFAULT_HASH_MB)
+        self.threads = 1  # more search on helper processes with Lazy SMP (see ParallelSearch)
+        self.stop_event = threading.Event()
+        self.search = None
+        self.search_thread = None
+        self.infinite = False  # bestmove of "go infinite" waits for stop even if the search is done
+        self.output_lock = threading.Lock()  # the search thread and the command thread both send lines
+
+    def send(self, line):
+        with self.output_lock:
+            print(line, file=self.output, flush=True)
+
+    def run(self, commands=sys.stdin):
+        """
+        Answer the commands, one per line, until quit or the end of the input.
+        """
+        for line in commands:
+            if not self.handleCommand(line):
+                break
+        self.stopSearch()
+
+    def handleCommand(self, line):
+        """
+        Answer one command, returns False for quit. Unknown commands are ignored, as the protocol asks.
+        """
+        words = line.split()
+        if not words:
+            return True
+        command, arguments = words[0], words[1:]
+        if command == "uci":
+            self.send("id name " + ENGINE_NAME)
+            self.send("id author " + ENGINE_AUTHOR)
+            self.send("option name Hash type spin default {} min 1 max {}".format(DEFAULT_HASH_MB, MAX_HASH_MB))
+            self.send("option name Threads type spin default 1 min 1 max {}".format(MAX_THREADS))
+            self.send("option name SyzygyPath type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            if self.search_thread is None or not self.search_thread.is_alive():
+                # load the KPK bitbase while no search runs, readyok waits for it but no clock does yet;
+                # during a search readyok is sent at once
+                Tablebase.loadKPK()
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stopSearch()
+            Tablebase.loadKPK()
+            self.transposition_table.clear()
+            self.game_state = ChessEngine.GameState()
+        elif command == "setoption":
+            self.stopSearch()
+            self.setOption(arguments)
+        elif command == "position":
+            self.stopSearch()
+            self.setPosition(arguments)
+        elif command == "go":
+            self.stopSearch()
+            self.startSearch(arguments)
+        elif command == "stop":
+            self.stopSearch()
+        elif command == "quit":
+            return False
+        return True
+
+    def setOption(self, arguments):
+        """
+        setoption name <name> value <value>
+        """
+        if "value" in arguments:
+            name = " ".join(arguments[1:arguments.index("value")])
+            value = " ".join(arguments[arguments.index("value") + 1:])
+        else:
+            name, value = " ".join(arguments[1:]), ""
+        if name.lower() == "hash":
+            try:
+                size_mb = int(value)
+            except ValueError:
+                self.send("info string Hash needs a number of MB")
+                return
+            self.transposition_table.resize(min(max(size_mb, 1), MAX_HASH_MB))
+        elif name.lower() == "threads":
+            try:
+                threads = int(value)
+            except ValueError:
+                self.send("info string Threads needs a number")
+                return
+            self.threads = min(max(threads, 1), MAX_THREADS)
+            if self.threads > 1 and not self.transposition_table.shared:  # the helpers need it in shared memory
+                self.transposition_table = TranspositionTable(self.transposition_table.size_mb, shared=True)
+        elif name.lower() == "syzygypath" and value and value != "<empty>":
+            try:
+                Tablebase.openSyzygy(value)
+            except (ImportError, OSError) as error:
+                self.send("info string no Syzygy tablebases: " + str(error))
+
+    def setPosition(self, arguments):
+        """
+        position startpos [moves <move> ...] or position fen <FEN> [moves <move> ...]
+        """
+        moves_index = arguments.index("moves") if "moves" in arguments else len(arguments)
+        if arguments and arguments[0] == "fen":
+            FEN = " ".join(arguments[1:moves_index])
+        else:
+            FEN = START_FEN
+        game_state = ChessEngine.GameState()
+        try:
+            game_state.FEN_to_board(FEN)
+        except ValueError as error:
+            self.send("info string " + str(error))
+            return
+        for notation in arguments[moves_index + 1:]:
+            move = game_state.parseMove(notation)
+            if move is None:
+                self.send("info string illegal move " + notation)
+                break
+            game_state.makeEncodedMove(move)
+        self.game_state = game_state
+
+    def startSearch(self, arguments):
+        """
+        go [depth <plies>] [nodes <n>] [movetime <ms>] [wtime <ms>] [btime <ms>] [winc <ms>] [binc <ms>]
+        [movestogo <n>] [infinite], go without limits searches until stop.
+        """
+        values = {}
+        for index, word in enumerate(arguments[:-1]):
+            if word in GO_TIMES or word in GO_COUNTS:
+                try:
+                    values[word] = int(arguments[index + 1])
+                except ValueError:
+                    pass
+        times = {word: values[word] / 1000 if word in values else None for word in GO_TIMES}
+        limits = SearchLimits(depth=values.get("depth"), nodes=values.get("nodes"), move_time=times["movetime"],
+                              white_time=times["wtime"], black_time=times["btime"],
+                              white_increment=times["winc"] or 0, black_increment=times["binc"] or 0,
+                              moves_to_go=values.get("movestogo"))
+        self.infinite = "infinite" in arguments or not limits.isBounded()
+        self.stop_event.clear()
+        self.search = Search(self.game_state, self.transposition_table, self.stop_event)
+        self.search_thread = threading.Thread(target=self.searchPosition, args=(self.search, limits), daemon=True)
+        self.search_thread.start()
+
+    def stopSearch(self):
+        """
+        Stop the running search, its bestmove is sent before this returns.
+        """
+        if self.search_thread is not None:
+            self.infinite = False
+            self.stop_event.set()
+            self.search_thread.join()
+            self.search_thread = None
+
+    def searchPosition(self, search, limits):
+        """
+        Runs on the search thread: search, report every completed depth and send the best move. bestmove is sent
+        even if the search fails, 0000 if there is no move, since the GUI waits for it.
+        """
+        best_move = None
+        try:
+            if self.threads > 1:
+                result = searchParallel(search, limits, self.threads, report=self.sendInfo)
+            else:
+                result = search.iterativeDeepening(limits, report=self.sendInfo)
+            best_move = result.best_move
+        except Exception as error:
+            self.send("info string search failed: {}: {}".format(type(error).__name__, error))
+        if self.infinite:
+            self.stop_event.wait()
+        if best_move is None:
+            self.send("bestmove 0000")
+        else:
+            self.send("bestmove " + self.game_state.moveToUCI(best_move))
+
+    def sendInfo(self, result):
+        if abs(result.score) >= MATE_THRESHOLD:
+            moves = (CHECKMATE - abs(result.score) + 1) // 2
+            score = "mate {}".format(moves if result.score > 0 else -moves)
+        else:
+            score = "cp {}".format(result.score)
+        line = self.search.principalVariation(result.best_move, result.depth)
+        self.send("info depth {} score {} nodes {} nps {} time {} pv {}".format(
+            result.depth, score, result.nodes, result.nodes_per_second, int(result.elapsed * 1000),
+            " ".join(self.game_state.moveToUCI(move) for move in line)))
+
+
+def main():
+    UCIEngine().run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""
+Random 64-bit keys for Zobrist hashing.
+The hash of a position is the XOR of the key of every piece on its square, the side to move key if black
+is to move, the key of the castling rights and the key of the en-passant file. Making a move only changes
+a few of these terms, so the hash can be updated by XOR-ing them out and in instead of being recomputed.
+"""
+
+import random
+
+_random = random.Random(20210521)  # fixed seed, so keys (and stored hashes) are the same in every run
+
+PIECE_KEYS = [[_random.getrandbits(64) for _ in range(64)] for _ in range(12)]  # indexed by piece code and square
+BLACK_TO_MOVE_KEY = _random.getrandbits(64)
+CASTLING_KEYS = [_random.getrandbits(64) for _ in range(16)]  # indexed by the 4-bit castling rights mask
+ENPASSANT_KEYS = [_random.getrandbits(64) for _ in range(8)]  # indexed by the file of the en-passant square